@@ -1,7 +1,102 @@
-from argparse import ArgumentParser
+from argparse import ArgumentParser, Namespace
 
+from launcher.ratelimit import DEFAULT_POOL_SIZE, parse_endpoint_rate
 
-SERVER_PARSER = ArgumentParser(add_help=False)
+
+CLIENT_PARSER = ArgumentParser(add_help=False)
+CLIENT_PARSER.add_argument(
+    "--connection-pool-size",
+    help=f"""Maximum number of connections that are kept alive per openQA
+instance. Defaults to {DEFAULT_POOL_SIZE}.""",
+    nargs=1,
+    default=[DEFAULT_POOL_SIZE],
+    type=int,
+)
+CLIENT_PARSER.add_argument(
+    "--retries",
+    help="""Maximum number of retries of GET, PUT and DELETE requests to
+openQA after connection errors or server errors. Defaults to 3.""",
+    nargs=1,
+    default=[3],
+    type=int,
+)
+CLIENT_PARSER.add_argument(
+    "--post-retries",
+    help="""Maximum number of retries of POST requests to openQA. These are
+only retried if the server rejected them as overloaded (429 & 503), so that no
+job is scheduled twice. Defaults to 2.""",
+    nargs=1,
+    default=[2],
+    type=int,
+)
+CLIENT_PARSER.add_argument(
+    "--retry-backoff",
+    help="""Wait time in seconds before the first retry. It is doubled for
+every further retry and randomized. Defaults to 1.""",
+    nargs=1,
+    default=[1.0],
+    type=float,
+)
+CLIENT_PARSER.add_argument(
+    "--circuit-breaker-threshold",
+    help="""Number of consecutive failed requests after which no further
+requests are sent to the openQA instance for --circuit-breaker-timeout seconds.
+0 disables the circuit breaker. Defaults to 5.""",
+    nargs=1,
+    default=[5],
+    type=int,
+)
+CLIENT_PARSER.add_argument(
+    "--circuit-breaker-timeout",
+    help="""Number of seconds after which an openQA instance is contacted
+again once the circuit breaker opened. Defaults to 30.""",
+    nargs=1,
+    default=[30.0],
+    type=float,
+)
+CLIENT_PARSER.add_argument(
+    "--rate-limit",
+    help="""Maximum number of requests per second that are sent to the openQA
+instance. 0 disables the limit. Defaults to 10 for openqa.opensuse.org and no
+limit for all other instances.""",
+    nargs=1,
+    default=[None],
+    type=float,
+)
+CLIENT_PARSER.add_argument(
+    "--rate-limit-burst",
+    help="""Number of requests that may be sent at once before the rate limit
+applies. Defaults to the rate limit.""",
+    nargs=1,
+    default=[None],
+    type=float,
+)
+CLIENT_PARSER.add_argument(
+    "--endpoint-rate-limit",
+    help="""Maximum number of requests per second that are sent to a single
+endpoint, given as PATH=RATE with ids replaced by {id}, e.g. 'isos=2' or
+'jobs/{id}/cancel=5'. Can be given multiple times.""",
+    action="append",
+    default=[],
+    type=parse_endpoint_rate,
+)
+CLIENT_PARSER.add_argument(
+    "--metrics",
+    help="""Record the number, latency and response size of the requests to
+openQA and OBS and write them into this file on exit ('-' for stderr)""",
+    nargs=1,
+    default=[None],
+    type=str,
+)
+CLIENT_PARSER.add_argument(
+    "--metrics-format",
+    help="Format of the recorded metrics. Defaults to json.",
+    nargs=1,
+    choices=("json", "prometheus"),
+    default=["json"],
+)
+
+SERVER_PARSER = ArgumentParser(add_help=False, parents=[CLIENT_PARSER])
 SERVER_PARSER.add_argument(
     "--server",
     help="""Hostname of the openqa instance to be used.
@@ -17,3 +112,69 @@ SERVER_PARSER.add_argument(
     choices=("https", "http", ""),
     default=[""],
 )
+
+HISTORY_PARSER = ArgumentParser(add_help=False)
+HISTORY_PARSER.add_argument(
+    "--history",
+    help="""Path to the SQLite database in which the builds and the results of
+their jobs are recorded.
+Defaults to $XDG_DATA_HOME/kiwi-functional-tests/history.sqlite""",
+    nargs=1,
+    default=[None],
+    type=str,
+)
+HISTORY_PARSER.add_argument(
+    "--no-history",
+    help="Don't record the build in the history database",
+    action="store_true",
+)
+
+
+def configure_clients(args: Namespace) -> None:
+    """Apply the options of :py:const:`CLIENT_PARSER` to the clients created
+    via :py:func:`launcher.client.get_client`.
+    """
+    from launcher.client import CLIENT_CONFIG, RetryPolicy
+
+    CLIENT_CONFIG.pool_size = args.connection_pool_size[0]
+    CLIENT_CONFIG.retry_policy = RetryPolicy(
+        retries={
+            "GET": args.retries[0],
+            "PUT": args.retries[0],
+            "DELETE": args.retries[0],
+            "POST": args.post_retries[0],
+        },
+        backoff=args.retry_backoff[0],
+    )
+    CLIENT_CONFIG.circuit_breaker_threshold = args.circuit_breaker_threshold[0]
+    CLIENT_CONFIG.circuit_breaker_timeout = args.circuit_breaker_timeout[0]
+    CLIENT_CONFIG.rate_limit = args.rate_limit[0]
+    CLIENT_CONFIG.rate_limit_burst = args.rate_limit_burst[0]
+    CLIENT_CONFIG.endpoint_rate_limits = dict(args.endpoint_rate_limit)
+
+
+def configure_metrics(args: Namespace) -> None:
+    """Enable the request metrics if requested via the options of
+    :py:const:`CLIENT_PARSER` and export them once the process exits.
+    """
+    if args.metrics[0] is None:
+        return
+
+    import atexit
+
+    from launcher.metrics import METRICS
+
+    METRICS.enabled = True
+    atexit.register(METRICS.export, args.metrics[0], args.metrics_format[0])
+
+
+def open_history(args: Namespace):
+    """Open the history database specified via the options of
+    :py:const:`HISTORY_PARSER` or return None if the history is disabled.
+    """
+    if args.no_history:
+        return None
+
+    from launcher.history import BuildHistory, default_history_path
+
+    return BuildHistory(args.history[0] or default_history_path())
@@ -0,0 +1,159 @@
+"""Pre-flight check of the assets of the jobs before they are scheduled.
+
+openQA schedules a job even if its ISO or disk image cannot be downloaded,
+e.g. because the image is not published yet or only some of the mirrors of
+download.opensuse.org have synced it. Such jobs go incomplete after they
+occupied a worker. :py:func:`check_assets` therefore sends a ``HEAD`` request
+to every asset url in parallel, following the redirects to the mirrors, so
+that the affected jobs can be reported or dropped before they are scheduled.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Iterable, List, Tuple, Union
+from urllib.parse import urlsplit
+
+from launcher.metrics import METRICS
+
+if TYPE_CHECKING:
+    from requests import Session
+
+
+#: parameters of the ``POST isos`` requests that contain the asset urls
+ASSET_URL_PARAMS = ("ISO_1_URL", "HDD_1_URL", "HDD_1_DECOMPRESS_URL")
+
+#: the supported modes of ``--check-assets``
+ASSET_CHECK_MODES = ("off", "report", "drop")
+
+_Params = Dict[str, Union[str, int]]
+
+
+@dataclass
+class AssetStatus:
+    """Result of the ``HEAD`` request to the url of an asset."""
+
+    url: str
+    #: status code of the final response, None if the request failed
+    status_code: int | None = None
+    #: size of the asset according to the final response
+    size: int | None = None
+    #: url of the mirror to which the request was redirected, if any
+    mirror: str | None = None
+    #: error of the request if it failed
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return (
+            self.error is None
+            and self.status_code is not None
+            and self.status_code < 400
+            and bool(self.size)
+        )
+
+    @property
+    def problem(self) -> str:
+        """Description of why the asset is not usable."""
+        if self.error is not None:
+            return self.error
+        location = (
+            f"mirror {urlsplit(self.mirror).netloc}" if self.mirror else "it"
+        )
+        if self.status_code is None or self.status_code >= 400:
+            return f"{location} replied with {self.status_code}"
+        if not self.size:
+            return f"{location} reports a size of {self.size}"
+        return ""
+
+
+@dataclass
+class AssetFailure:
+    params: _Params
+    status: AssetStatus
+
+    def __str__(self) -> str:
+        return (
+            f"Asset {self.status.url} of {self.params.get('PACKAGE')} "
+            f"({self.params.get('FLAVOR')}) for {self.params.get('DISTRI')} "
+            f"{self.params.get('VERSION')} is not available: "
+            f"{self.status.problem}"
+        )
+
+
+def asset_urls(params: _Params) -> List[str]:
+    """Returns the asset urls in the parameters of a ``POST isos``."""
+    return [str(params[key]) for key in ASSET_URL_PARAMS if params.get(key)]
+
+
+def check_asset(
+    session: Session, url: str, timeout: float = 30.0
+) -> AssetStatus:
+    from requests import RequestException
+
+    status = AssetStatus(url)
+    with METRICS.timed("download", "HEAD", "asset"):
+        try:
+            response = session.head(url, allow_redirects=True, timeout=timeout)
+        except RequestException as exc:
+            status.error = str(exc)
+            return status
+
+    status.status_code = response.status_code
+    if response.history:
+        status.mirror = response.url
+    if (length := response.headers.get("Content-Length")) is not None:
+        status.size = int(length)
+    return status
+
+
+def check_assets(
+    urls: Iterable[str], max_workers: int = 16, timeout: float = 30.0
+) -> Dict[str, AssetStatus]:
+    """Check every distinct url in ``urls`` via :py:func:`check_asset`,
+    sending at most ``max_workers`` requests in parallel over a shared pool
+    of connections.
+    """
+    from requests import Session
+    from requests.adapters import HTTPAdapter
+
+    distinct = list(dict.fromkeys(urls))
+    with Session() as session, ThreadPoolExecutor(
+        max_workers=max_workers
+    ) as executor:
+        adapter = HTTPAdapter(pool_maxsize=max_workers)
+        for prefix in ("http://", "https://"):
+            session.mount(prefix, adapter)
+        return dict(
+            zip(
+                distinct,
+                executor.map(
+                    lambda url: check_asset(session, url, timeout), distinct
+                ),
+            )
+        )
+
+
+def split_by_assets(
+    all_params: List[_Params], statuses: Dict[str, AssetStatus]
+) -> Tuple[List[_Params], List[AssetFailure]]:
+    """Split the jobs in ``all_params`` by the ``statuses`` of their assets
+    (see :py:func:`check_assets`).
+
+    Returns the parameters of the jobs whose assets are all available and
+    a failure for every asset that is not.
+    """
+    available: List[_Params] = []
+    failures: List[AssetFailure] = []
+    for params in all_params:
+        unavailable = [
+            AssetFailure(params, statuses[url])
+            for url in asset_urls(params)
+            if not statuses[url].ok
+        ]
+        if unavailable:
+            failures += unavailable
+        else:
+            available.append(params)
+    return available, failures
@@ -0,0 +1,623 @@
+"""End-to-end benchmark of the console scripts against local stand-ins for
+openQA and OBS.
+
+The stand-ins implement just enough of the openQA REST API (``isos``,
+``jobs``, ``products``, ``test_suites``, ``machines``, ``job_groups`` and
+``job_templates_scheduling``) and of the OBS binary listings (``/build`` and
+``/published``) to let ``settings``, ``schedule_test_run`` and ``monitor`` run
+unmodified. Every response is delayed by a configurable latency and every
+request is counted, so that the wall time and the number of requests of each
+entry point can be compared between revisions of the launcher.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from dataclasses import dataclass, field
+from glob import glob
+from hashlib import sha256
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from typing import Any, Dict, List, Self, Tuple
+from urllib.parse import parse_qsl, unquote, urlsplit
+from xml.sax.saxutils import quoteattr
+
+from launcher.importtime import ENTRY_POINTS
+from launcher.metrics import normalize_path
+
+
+_SETTINGS_PARAM = re.compile(r"^settings\[(?P<key>.+)\]$")
+
+
+@dataclass
+class StandIn(ABC):
+    """Base of the stand-in servers: delays and counts every request."""
+
+    #: delay of every response in seconds
+    latency: float = 0.0
+    #: fraction of the requests that fail with 503 Service Unavailable
+    error_rate: float = 0.0
+
+    #: number of requests per method and normalized path
+    requests: Counter[Tuple[str, str]] = field(default_factory=Counter)
+
+    _lock: Lock = field(default_factory=Lock, repr=False)
+    _server: ThreadingHTTPServer | None = field(default=None, repr=False)
+
+    @abstractmethod
+    def handle(
+        self, method: str, path: str, params: Dict[str, str]
+    ) -> Tuple[int, str, str]:
+        """Return the status code, the content type and the body of the
+        response to the request.
+        """
+
+    def count(self, method: str, path: str) -> None:
+        with self._lock:
+            self.requests[(method, normalize_path(path))] += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests.clear()
+
+    @property
+    def url(self) -> str:
+        assert self._server is not None
+        host, port = self._server.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    def start(self) -> Self:
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # headers and body are written separately, which otherwise
+            # stalls keep-alive connections on delayed ACKs
+            disable_nagle_algorithm = True
+
+            def _respond(self) -> None:
+                url = urlsplit(self.path)
+                params = dict(parse_qsl(url.query, keep_blank_values=True))
+                if length := int(self.headers.get("Content-Length") or 0):
+                    body = self.rfile.read(length).decode()
+                    if self.headers.get("Content-Type", "").startswith(
+                        "application/json"
+                    ):
+                        params.update(json.loads(body))
+                    else:
+                        params.update(parse_qsl(body, keep_blank_values=True))
+
+                path = unquote(url.path)
+                stand_in.count(self.command, path)
+                time.sleep(stand_in.latency)
+                if random.random() < stand_in.error_rate:
+                    status, content_type, reply = 503, "text/plain", "busy"
+                else:
+                    status, content_type, reply = stand_in.handle(
+                        self.command, path, params
+                    )
+
+                encoded = reply.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(encoded)))
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            do_GET = do_POST = do_PUT = do_DELETE = _respond
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def _settings_list(params: Dict[str, Any]) -> List[Dict[str, str]]:
+    if isinstance(settings := params.get("settings"), list):
+        return settings
+    return [
+        {"key": match.group("key"), "value": value}
+        for key, value in params.items()
+        if (match := _SETTINGS_PARAM.match(key)) is not None
+    ]
+
+
+def _entry(params: Dict[str, Any], entry_id: int) -> Dict[str, Any]:
+    return {
+        **{
+            key: value
+            for key, value in params.items()
+            if _SETTINGS_PARAM.match(key) is None
+        },
+        "id": entry_id,
+        "settings": _settings_list(params),
+    }
+
+
+@dataclass
+class OpenQAStandIn(StandIn):
+    """Stand-in for the REST API of an openQA instance.
+
+    Every POST to ``isos`` creates ``jobs_per_product`` jobs. Every tenth job
+    is still running and every tenth job failed, all others passed.
+
+    The settings of test suites, products and machines are decoded from the
+    ``settings[KEY]=value`` parameters like openQA does, so that a second
+    run of ``settings`` only reads from the stand-in.
+    """
+
+    #: number of jobs that are created per scheduled product
+    jobs_per_product: int = 2
+
+    test_suites: List[Dict[str, Any]] = field(default_factory=list)
+    products: List[Dict[str, Any]] = field(default_factory=list)
+    machines: List[Dict[str, Any]] = field(default_factory=list)
+    job_groups: List[Dict[str, Any]] = field(default_factory=list)
+    job_templates: Dict[int, str] = field(default_factory=dict)
+    jobs: Dict[int, Dict[str, Any]] = field(default_factory=dict)
+
+    _next_id: int = field(default=1, repr=False)
+
+    def _new_id(self) -> int:
+        with self._lock:
+            self._next_id += 1
+            return self._next_id
+
+    def _new_job(self, settings: Dict[str, str]) -> Dict[str, Any]:
+        job_id = self._new_id()
+        state, result = {0: ("running", "none"), 1: ("done", "failed")}.get(
+            job_id % 10, ("done", "passed")
+        )
+        no_dependencies: Dict[str, List[int]] = {
+            "Chained": [],
+            "Parallel": [],
+            "Directly chained": [],
+        }
+        return {
+            "id": job_id,
+            "name": f"{settings.get('DISTRI')}-{settings.get('VERSION')}-"
+            f"{settings.get('FLAVOR')}-{settings.get('BUILD')}",
+            "priority": 50,
+            "has_parents": 0,
+            "group_id": 1,
+            "blocked_by_id": None,
+            "children": no_dependencies,
+            "parents": no_dependencies,
+            "parents_ok": 1,
+            "result": result,
+            "state": state,
+            "test": "kiwi_disk_image_test",
+            "t_started": "2024-01-01T00:00:00",
+            "t_finished": ("2024-01-01T00:10:00" if state == "done" else None),
+            "clone_id": None,
+            "settings": settings,
+        }
+
+    def handle(
+        self, method: str, path: str, params: Dict[str, Any]
+    ) -> Tuple[int, str, str]:
+        if not path.startswith("/api/v1/"):
+            return 404, "text/plain", "not found"
+        path = path[len("/api/v1/") :]
+        reply: Any = None
+
+        collections = {
+            "test_suites": ("TestSuites", self.test_suites),
+            "products": ("Products", self.products),
+            "machines": ("Machines", self.machines),
+        }
+        if path in collections and method == "GET":
+            key, entries = collections[path]
+            reply = {key: entries}
+        elif path in collections and method == "POST":
+            entries = collections[path][1]
+            entries.append(_entry(params, entry_id := self._new_id()))
+            reply = {"id": entry_id}
+        elif (match := re.fullmatch(r"(\w+)/(\d+)", path)) and match.group(
+            1
+        ) in collections:
+            entries = collections[match.group(1)][1]
+            for i, entry in enumerate(entries):
+                if entry["id"] == int(match.group(2)):
+                    entries[i] = _entry(params, entry["id"])
+                    reply = {"result": 1}
+        elif path == "job_groups" and method == "GET":
+            reply = self.job_groups
+        elif path == "job_groups" and method == "POST":
+            self.job_groups.append(
+                {"id": (group_id := self._new_id()), "name": params["name"]}
+            )
+            if "template" in params:
+                self.job_templates[group_id] = params["template"]
+            reply = {"id": group_id}
+        elif match := re.fullmatch(r"job_templates_scheduling/(\d+)", path):
+            if method == "GET":
+                return (
+                    200,
+                    "text/yaml",
+                    self.job_templates.get(int(match.group(1)), ""),
+                )
+            self.job_templates[int(match.group(1))] = params["template"]
+            reply = {"id": [int(match.group(1))]}
+        elif path == "isos" and method == "POST":
+            settings = {key: str(value) for key, value in params.items()}
+            # openQA names the downloaded assets after the file in the url
+            for key, value in params.items():
+                if key.endswith("_URL"):
+                    asset = os.path.basename(urlsplit(str(value)).path)
+                    if "_DECOMPRESS_" in key:
+                        asset = os.path.splitext(asset)[0]
+                    settings[key.replace("_DECOMPRESS", "")[:-4]] = asset
+            jobs = [
+                self._new_job(settings) for _ in range(self.jobs_per_product)
+            ]
+            with self._lock:
+                self.jobs.update((job["id"], job) for job in jobs)
+            reply = {
+                "ids": [job["id"] for job in jobs],
+                "count": len(jobs),
+                "failed": [],
+            }
+        elif path == "jobs" and method == "GET":
+            ids = [int(i) for i in params.get("ids", "").split(",") if i]
+            reply = {"jobs": [self.jobs[i] for i in ids if i in self.jobs]}
+        elif (match := re.fullmatch(r"jobs/(\d+)", path)) and int(
+            match.group(1)
+        ) in self.jobs:
+            reply = {"job": self.jobs[int(match.group(1))]}
+        elif (match := re.fullmatch(r"jobs/(\d+)/cancel", path)) and int(
+            match.group(1)
+        ) in self.jobs:
+            job = self.jobs[int(match.group(1))]
+            if job["state"] != "done":
+                job.update(state="cancelled", result="user_cancelled")
+            reply = {"result": 1}
+
+        if reply is None:
+            return 404, "application/json", json.dumps({"error": "not found"})
+        return 200, "application/json", json.dumps(reply)
+
+
+@dataclass
+class ObsStandIn(StandIn):
+    """Stand-in for the binary listings of the OBS API.
+
+    Every package of :py:const:`launcher.constants.ALL_TESTS` has an iso and a
+    qcow2 image, which are published with their ``.sha256`` files in the
+    ``iso`` subdirectory and the root of the repository, respectively. Every
+    listing additionally contains ``listing_size`` unrelated files.
+    """
+
+    #: number of unrelated files in every listing
+    listing_size: int = 20
+
+    #: the published files per project, repository and subdirectory
+    published: Dict[Tuple[str, str, str], List[str]] = field(
+        default_factory=dict
+    )
+
+    def __post_init__(self) -> None:
+        from launcher.constants import ALL_TESTS
+
+        for tests in ALL_TESTS:
+            for package in tests.packages:
+                iso, disk = self._images(package.package)
+                self.published.setdefault(
+                    (package.project, package.repository, "iso"), []
+                ).extend([iso, f"{iso}.sha256"])
+                self.published.setdefault(
+                    (package.project, package.repository, ""), ["iso"]
+                ).extend([disk, f"{disk}.sha256"])
+
+    @staticmethod
+    def _images(package: str) -> Tuple[str, str]:
+        name = package.replace(":", "-")
+        return (
+            f"{name}.x86_64-1.0.0-Build1.1.iso",
+            f"{name}.x86_64-1.0.0-Build1.1.qcow2",
+        )
+
+    def _filler(self, prefix: str) -> List[str]:
+        return [f"{prefix}-{i}.x86_64.rpm" for i in range(self.listing_size)]
+
+    def count(self, method: str, path: str) -> None:
+        with self._lock:
+            self.requests[(method, path.strip("/").split("/")[0])] += 1
+
+    def handle(
+        self, method: str, path: str, params: Dict[str, str]
+    ) -> Tuple[int, str, str]:
+        parts = path.strip("/").split("/")
+        if method == "GET" and parts[0] == "build" and len(parts) == 5:
+            files = [*self._images(parts[4]), *self._filler(parts[4])]
+            return (
+                200,
+                "application/xml",
+                "<binarylist>"
+                + "".join(
+                    f"<binary filename={quoteattr(name)} size='1' mtime='1'/>"
+                    for name in files
+                )
+                + "</binarylist>",
+            )
+        if (
+            method == "GET"
+            and parts[0] == "published"
+            and parts[-1].endswith(".sha256")
+        ):
+            binary = parts[-1][: -len(".sha256")]
+            checksum = sha256(binary.encode()).hexdigest()
+            return 200, "text/plain", f"{checksum}  {binary}\n"
+        if method == "GET" and parts[0] == "published" and len(parts) >= 3:
+            key = (parts[1], parts[2], "/".join(parts[3:]))
+            if key not in self.published:
+                return 404, "application/xml", "<status code='not_found'/>"
+            files = [*self.published[key], *self._filler(parts[2])]
+            return (
+                200,
+                "application/xml",
+                "<directory>"
+                + "".join(f"<entry name={quoteattr(name)}/>" for name in files)
+                + "</directory>",
+            )
+        return 404, "application/xml", "<status code='not_found'/>"
+
+
+@dataclass(frozen=True)
+class BenchmarkResult:
+    """Wall time and requests of a single run of a console script."""
+
+    #: name of the benchmarked scenario
+    name: str
+    #: exit code of the console script
+    returncode: int
+    #: wall time of the run in seconds
+    wall_time: float
+    #: number of requests to openQA per method and path
+    openqa_requests: Dict[str, int]
+    #: number of requests to OBS per method and path
+    obs_requests: Dict[str, int]
+
+    def __str__(self) -> str:
+        return (
+            f"{self.name:<32} {self.wall_time:8.2f} s "
+            f"{sum(self.openqa_requests.values()):8} "
+            f"{sum(self.obs_requests.values()):8}"
+            + ("" if self.returncode == 0 else f"  (exit {self.returncode})")
+        )
+
+
+class Benchmark:
+    """Runs the console scripts against fresh stand-ins in a temporary
+    directory that is also used as their home, data and cache directory.
+    """
+
+    def __init__(
+        self,
+        openqa: OpenQAStandIn,
+        obs: ObsStandIn,
+        workdir: str,
+        verbose: bool = False,
+    ) -> None:
+        self.openqa = openqa
+        self.obs = obs
+        self.workdir = workdir
+        self.verbose = verbose
+
+        oscrc = os.path.join(workdir, "oscrc")
+        with open(oscrc, "w") as oscrc_file:
+            oscrc_file.write(
+                f"""[general]
+apiurl = {obs.url}
+
+[{obs.url}]
+user = benchmark
+pass = benchmark
+credentials_mgr_class = osc.credentials.PlaintextConfigFileCredentialsManager
+allow_http = 1
+"""
+            )
+        os.chmod(oscrc, 0o600)
+
+        launcher_root = os.path.dirname(
+            os.path.dirname(os.path.abspath(__file__))
+        )
+        self.env = {
+            **os.environ,
+            "HOME": workdir,
+            "XDG_CACHE_HOME": os.path.join(workdir, "cache"),
+            "XDG_DATA_HOME": os.path.join(workdir, "data"),
+            "XDG_CONFIG_HOME": os.path.join(workdir, "config"),
+            "XDG_STATE_HOME": os.path.join(workdir, "state"),
+            "OSC_CONFIG": oscrc,
+            "PYTHONPATH": os.pathsep.join(
+                filter(None, (launcher_root, os.environ.get("PYTHONPATH")))
+            ),
+        }
+
+    def run(self, name: str, script: str, *args: str) -> BenchmarkResult:
+        """Run the console script ``script`` with ``args`` and return its
+        wall time and the requests that it sent.
+        """
+        self.openqa.reset()
+        self.obs.reset()
+        code = (
+            f"import sys; sys.argv[0] = {script!r}; "
+            f"from {ENTRY_POINTS[script]} import main; main()"
+        )
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-c", code, *args],
+            cwd=self.workdir,
+            env=self.env,
+            stdout=None if self.verbose else subprocess.DEVNULL,
+            stderr=None if self.verbose else subprocess.PIPE,
+            text=True,
+            check=False,
+        )
+        wall_time = time.perf_counter() - start
+        if proc.returncode != 0 and not self.verbose:
+            print(proc.stderr, file=sys.stderr)
+
+        return BenchmarkResult(
+            name=name,
+            returncode=proc.returncode,
+            wall_time=wall_time,
+            openqa_requests={
+                f"{method} {path}": count
+                for (method, path), count in sorted(
+                    self.openqa.requests.items()
+                )
+            },
+            obs_requests={
+                f"{method} {path}": count
+                for (method, path), count in sorted(self.obs.requests.items())
+            },
+        )
+
+    def run_all(self) -> List[BenchmarkResult]:
+        """Run the console scripts in the order in which they are used for a
+        build: settings, scheduling of the tests and monitoring.
+        """
+        server = ["--server", urlsplit(self.openqa.url).netloc]
+        server += ["--server-scheme", "http"]
+        schedule = [
+            *server,
+            "--obs-api-url",
+            self.obs.url,
+            "--build",
+            "benchmark",
+        ]
+
+        results = [
+            self.run("settings (initial)", "settings", *server),
+            self.run("settings (up to date)", "settings", *server),
+            self.run(
+                "schedule_test_run (cold)", "schedule_test_run", *schedule
+            ),
+            self.run(
+                "schedule_test_run (cached)", "schedule_test_run", *schedule
+            ),
+        ]
+
+        state_file = sorted(
+            glob(os.path.join(self.workdir, "kiwi_build_benchmark_*.json"))
+        )[-1]
+        results += [
+            self.run("monitor --print-state", "monitor", "-p", state_file),
+            self.run(
+                "monitor --print-state (journal)", "monitor", "-p", state_file
+            ),
+            self.run(
+                "schedule_test_run --only-changed",
+                "schedule_test_run",
+                *schedule,
+                "--only-changed",
+            ),
+            self.run("monitor --cancel", "monitor", "-c", state_file),
+        ]
+        return results
+
+
+def main() -> None:
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(
+        "launcher_benchmark",
+        description="""Benchmark the console scripts against local stand-ins of
+openQA and OBS""",
+    )
+    parser.add_argument(
+        "--openqa-latency",
+        help="Delay of every openQA response in ms. Defaults to 20.",
+        nargs=1,
+        default=[20.0],
+        type=float,
+    )
+    parser.add_argument(
+        "--obs-latency",
+        help="Delay of every OBS response in ms. Defaults to 50.",
+        nargs=1,
+        default=[50.0],
+        type=float,
+    )
+    parser.add_argument(
+        "--openqa-error-rate",
+        help="""Fraction of the openQA requests that fail with 503 Service
+Unavailable. Defaults to 0.""",
+        nargs=1,
+        default=[0.0],
+        type=float,
+    )
+    parser.add_argument(
+        "--jobs-per-product",
+        help="Number of jobs created per scheduled product. Defaults to 2.",
+        nargs=1,
+        default=[2],
+        type=int,
+    )
+    parser.add_argument(
+        "--listing-size",
+        help="""Number of unrelated files in every OBS listing.
+Defaults to 20.""",
+        nargs=1,
+        default=[20],
+        type=int,
+    )
+    parser.add_argument(
+        "--json",
+        help="Print the results including all request counts as JSON",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        help="Show the output of the console scripts",
+        action="store_true",
+    )
+
+    args = parser.parse_args()
+
+    openqa = OpenQAStandIn(
+        latency=args.openqa_latency[0] / 1000,
+        error_rate=args.openqa_error_rate[0],
+        jobs_per_product=args.jobs_per_product[0],
+    ).start()
+    obs = ObsStandIn(
+        latency=args.obs_latency[0] / 1000,
+        listing_size=args.listing_size[0],
+    ).start()
+    try:
+        with tempfile.TemporaryDirectory(prefix="launcher-bench-") as workdir:
+            results = Benchmark(openqa, obs, workdir, args.verbose).run_all()
+    finally:
+        openqa.stop()
+        obs.stop()
+
+    if args.json:
+        print(json.dumps([result.__dict__ for result in results], indent=2))
+    else:
+        print(f"{'scenario':<32} {'wall time':>10} {'openQA':>8} {'OBS':>8}")
+        for result in results:
+            print(result)
+
+    if any(result.returncode != 0 for result in results):
+        sys.exit(1)
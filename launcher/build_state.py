@@ -0,0 +1,140 @@
+"""Reading and writing of the build state files created by
+``schedule_test_run`` and consumed by ``monitor``.
+
+State files of version 2 are JSON Lines files. The first line is the header::
+
+    {"version": 2, "build": ..., "server": ..., "scheme": ...,
+     "job_id_ranges": [[first_id, last_id], ...]}
+
+where the job ids are stored as ranges of consecutive ids. Every following
+line is a journal entry appended by ``monitor``::
+
+    {"job": {...}}
+
+containing a snapshot of a job that is done or cancelled, including the id
+of its clone. These jobs are not fetched from openQA again.
+
+State files of version 1 consist of a single JSON object with the keys
+``build``, ``server``, ``scheme`` and ``job_ids``.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Iterable
+
+from launcher.openqa import JobSummary
+from launcher.running_build import RunningBuild
+
+
+#: version of the state files written by :py:func:`write_build_state`
+STATE_VERSION = 2
+
+#: settings that are kept in the snapshots of finished jobs
+SNAPSHOT_SETTINGS = (
+    "ARCH",
+    "BUILD",
+    "DISTRI",
+    "FLAVOR",
+    "HDD_1",
+    "ISO_1",
+    "PACKAGE",
+    "TEST",
+    "VERSION",
+)
+
+
+def compress_job_ids(job_ids: Iterable[int]) -> list[list[int]]:
+    """Compress the job ids into ranges ``[first, last]`` of consecutive ids,
+    preserving their order.
+    """
+    ranges: list[list[int]] = []
+    for job_id in job_ids:
+        if ranges and ranges[-1][1] + 1 == job_id:
+            ranges[-1][1] = job_id
+        else:
+            ranges.append([job_id, job_id])
+    return ranges
+
+
+def expand_job_id_ranges(ranges: Iterable[list[int]]) -> list[int]:
+    return [
+        job_id for first, last in ranges for job_id in range(first, last + 1)
+    ]
+
+
+def job_snapshot(job: JobSummary) -> dict[str, Any]:
+    """Returns the snapshot of ``job`` that is stored in the journal."""
+    return job.snapshot(SNAPSHOT_SETTINGS)
+
+
+def write_build_state(path: str, running_build: RunningBuild) -> None:
+    """Write the state of ``running_build`` into a new state file, including
+    a journal entry for each of its finished jobs.
+    """
+    header = {
+        "version": STATE_VERSION,
+        "build": running_build.build,
+        "server": running_build.server,
+        "scheme": running_build.scheme,
+        "job_id_ranges": compress_job_ids(running_build.job_ids),
+    }
+    with open(path, "w") as state_file:
+        state_file.write(json.dumps(header) + "\n")
+    append_to_journal(path, running_build.finished_jobs.values())
+
+
+def load_build_state(path: str) -> RunningBuild:
+    """Load the build from the state file in ``path``, which can be of
+    version 1 or 2.
+    """
+    with open(path, "r") as state_file:
+        contents = state_file.read()
+
+    try:
+        state = json.loads(contents)
+    except json.JSONDecodeError:
+        # JSON Lines files with journal entries are not a valid JSON document
+        state = None
+
+    if state is not None and "job_ids" in state:
+        return RunningBuild(**state)
+
+    header, *entries = (json.loads(line) for line in contents.splitlines())
+    if (version := header.get("version")) != STATE_VERSION:
+        raise ValueError(f"Unsupported version {version} of the state file")
+
+    finished_jobs = {}
+    for entry in entries:
+        # the journal only contains jobs that have been validated before
+        job = JobSummary.trusted(entry["job"])
+        finished_jobs[job.id] = job
+
+    return RunningBuild(
+        build=header["build"],
+        server=header["server"],
+        scheme=header["scheme"],
+        job_ids=expand_job_id_ranges(header["job_id_ranges"]),
+        finished_jobs=finished_jobs,
+    )
+
+
+def is_journaled(path: str) -> bool:
+    """Check whether the state file in ``path`` supports a journal, i.e.
+    whether it is not of version 1.
+    """
+    with open(path, "r") as state_file:
+        first_line = state_file.readline()
+    try:
+        return json.loads(first_line).get("version") == STATE_VERSION
+    except json.JSONDecodeError:
+        return False
+
+
+def append_to_journal(path: str, jobs: Iterable[JobSummary]) -> None:
+    """Append snapshots of the finished ``jobs`` to the journal of the state
+    file in ``path``.
+    """
+    with open(path, "a") as state_file:
+        for job in jobs:
+            state_file.write(json.dumps({"job": job_snapshot(job)}) + "\n")
@@ -1,25 +1,213 @@
-from typing import Any, Literal
+import random
+import time
+from dataclasses import dataclass, field, replace
+from threading import Lock
+from typing import Any
+from urllib.parse import urlsplit
 
 from openqa_client.client import OpenQA_Client
+from openqa_client.exceptions import ConnectionError as OpenQAConnectionError
+from openqa_client.exceptions import RequestError
+from requests import Response
+from requests.adapters import HTTPAdapter
 
+from launcher.metrics import METRICS
+from launcher.ratelimit import (
+    DEFAULT_POOL_SIZE,
+    DEFAULT_RATE_LIMITS,
+    RateLimiter,
+    TokenBucket,
+)
+from launcher.types import Method
 
-Method = Literal["GET", "POST", "PUT", "DELETE"]
+
+@dataclass
+class RetryPolicy:
+    """Decides which failed requests are retried and how long to wait before
+    the next attempt.
+
+    Idempotent requests are retried after connection errors and after the
+    responses in :py:attr:`retry_statuses`. POST requests are only retried
+    after the responses in :py:attr:`post_retry_statuses`, for which openQA
+    did not process the request, so that no job is scheduled twice.
+    """
+
+    #: maximum number of retries per method
+    retries: dict[Method, int] = field(
+        default_factory=lambda: {"GET": 3, "PUT": 3, "DELETE": 3, "POST": 2}
+    )
+    #: responses after which idempotent requests are retried
+    retry_statuses: frozenset[int] = frozenset({408, 429, 500, 502, 503, 504})
+    #: responses after which POST requests are retried
+    post_retry_statuses: frozenset[int] = frozenset({429, 503})
+    #: wait time before the first retry in seconds, it is doubled for every
+    #: further retry
+    backoff: float = 1.0
+    #: upper bound of the wait time in seconds
+    max_backoff: float = 30.0
+
+    def should_retry(
+        self, method: Method, attempt: int, error: Exception
+    ) -> bool:
+        """Whether the request that failed with ``error`` on its
+        ``attempt``-th retry should be retried once more.
+        """
+        if attempt >= self.retries.get(method, 0):
+            return False
+        if isinstance(error, RequestError):
+            return error.status_code in (
+                self.post_retry_statuses
+                if method == "POST"
+                else self.retry_statuses
+            )
+        # the request might have been processed if the connection dropped
+        return method != "POST" and isinstance(error, OpenQAConnectionError)
+
+    def delay(self, attempt: int) -> float:
+        """Time to wait before the ``attempt``-th retry.
+
+        The delay is drawn uniformly from zero to the exponential backoff
+        ("full jitter"), so that concurrent requests that failed together do
+        not hit the server again at the same time.
+        """
+        return random.uniform(
+            0, min(self.max_backoff, self.backoff * 2**attempt)
+        )
+
+
+#: retry policy that never retries
+NO_RETRIES = RetryPolicy(retries={})
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of sending a request to a server that is considered to
+    be down.
+    """
+
+
+@dataclass
+class CircuitBreaker:
+    """Stops sending requests to a server after ``failure_threshold``
+    consecutive failures for ``reset_timeout`` seconds.
+
+    Afterwards a single request is let through: if it succeeds, the circuit
+    is closed again, otherwise it stays open for another ``reset_timeout``.
+    A ``failure_threshold`` of 0 disables the circuit breaker.
+    """
+
+    #: number of consecutive failures after which the circuit opens
+    failure_threshold: int = 5
+    #: seconds until a request is let through an open circuit
+    reset_timeout: float = 30.0
+
+    failures: int = 0
+    #: time at which the circuit was opened, None if it is closed
+    opened_at: float | None = None
+
+    _probing: bool = field(default=False, repr=False)
+    _lock: Lock = field(default_factory=Lock, repr=False)
+
+    def before_request(self) -> None:
+        """Raise :py:class:`CircuitOpenError` if the request must not be
+        sent.
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if (
+                self._probing
+                or time.monotonic() - self.opened_at < self.reset_timeout
+            ):
+                raise CircuitOpenError(
+                    f"Not sending the request, the last {self.failures} "
+                    "requests to the server failed"
+                )
+            self._probing = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._probing or (
+                self.failure_threshold
+                and self.failures >= self.failure_threshold
+            ):
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+def _is_server_failure(error: Exception) -> bool:
+    """Whether ``error`` indicates that the server is down or overloaded, as
+    opposed to a rejected request.
+    """
+    if isinstance(error, RequestError):
+        return error.status_code >= 500 or error.status_code == 429
+    return isinstance(error, OpenQAConnectionError)
 
 
 class NoWaitClient(OpenQA_Client):
     """
-    Custom OpenQA_Client that uses no retries and zero wait times by default.
+    Custom OpenQA_Client that does not use the retries and the fixed wait
+    times of OpenQA_Client, but retries the requests according to its
+    :py:class:`RetryPolicy` (none by default), stops sending requests to
+    the server while its :py:class:`CircuitBreaker` is open and sends them no
+    faster than its :py:class:`~launcher.ratelimit.RateLimiter` allows.
     """
 
+    def __init__(
+        self,
+        server: str = "",
+        scheme: str = "",
+        pool_size: int = DEFAULT_POOL_SIZE,
+        retry_policy: RetryPolicy = NO_RETRIES,
+        circuit_breaker: CircuitBreaker | None = None,
+        rate_limiter: RateLimiter | None = None,
+    ) -> None:
+        super().__init__(server=server, scheme=scheme)
+        self.retry_policy = retry_policy
+        self.circuit_breaker = circuit_breaker or CircuitBreaker(
+            failure_threshold=0
+        )
+        self.rate_limiter = rate_limiter or RateLimiter()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        for prefix in ("http://", "https://"):
+            self.session.mount(prefix, adapter)
+        self.session.hooks["response"].append(self._record_response)
+
+    @staticmethod
+    def _record_response(
+        response: Response, *args: Any, **kwargs: Any
+    ) -> None:
+        if METRICS.enabled:
+            METRICS.record(
+                "openqa",
+                response.request.method or "GET",
+                response.request.path_url,
+                str(response.status_code),
+                response.elapsed.total_seconds(),
+                len(response.content),
+            )
+
     def openqa_request(
         self,
         method: Method,
         path: str,
         params: Any = None,
-        retries: int = 0,
-        wait: int = 0,
+        retries: int | None = None,
+        wait: int | None = None,
         data: Any = None,
     ):
+        """Send a request to openQA.
+
+        ``retries`` overrides the retry budget of the :py:class:`RetryPolicy`
+        for this request, ``wait`` is accepted for compatibility with
+        OpenQA_Client and ignored in favor of the backoff of the policy.
+        """
         if (
             params is not None
             and not isinstance(params, dict)
@@ -33,6 +221,118 @@ class NoWaitClient(OpenQA_Client):
         ):
             data = data.__dict__
 
-        return super().openqa_request(
-            method, path, params=params, retries=retries, wait=wait, data=data
+        policy = self.retry_policy
+        if retries is not None:
+            policy = replace(policy, retries={method: retries})
+
+        attempt = 0
+        while True:
+            self.circuit_breaker.before_request()
+            self.rate_limiter.acquire(path)
+            try:
+                reply = super().openqa_request(
+                    method,
+                    path,
+                    params=params,
+                    retries=0,
+                    wait=0,
+                    data=data,
+                )
+            except Exception as exc:
+                if isinstance(exc, OpenQAConnectionError):
+                    # requests that got a response are recorded by the
+                    # session hook
+                    METRICS.record(
+                        "openqa", method, path, "ConnectionError", 0.0
+                    )
+                if _is_server_failure(exc):
+                    self.circuit_breaker.record_failure()
+                else:
+                    self.circuit_breaker.record_success()
+                if not policy.should_retry(method, attempt, exc):
+                    raise
+                time.sleep(policy.delay(attempt))
+                attempt += 1
+            else:
+                self.circuit_breaker.record_success()
+                return reply
+
+
+@dataclass
+class ClientConfig:
+    """Settings that are applied to the clients created by
+    :py:func:`get_client`.
+    """
+
+    #: maximum number of connections that are kept alive per server
+    pool_size: int = DEFAULT_POOL_SIZE
+    #: retry policy shared by all clients
+    retry_policy: RetryPolicy = field(default_factory=RetryPolicy)
+    #: number of consecutive failures after which no further requests are
+    #: sent to a server, 0 disables the circuit breaker
+    circuit_breaker_threshold: int = 5
+    #: seconds until a server is contacted again after the circuit opened
+    circuit_breaker_timeout: float = 30.0
+    #: requests per second that are sent at most to a server, None uses the
+    #: rate of :py:const:`~launcher.ratelimit.DEFAULT_RATE_LIMITS` and 0
+    #: disables the limit
+    rate_limit: float | None = None
+    #: number of requests that may be sent at once, defaults to the rate
+    rate_limit_burst: float | None = None
+    #: requests per second that are sent at most to an endpoint of a server,
+    #: keyed by the normalized path of the endpoint (e.g. ``isos``)
+    endpoint_rate_limits: dict[str, float] = field(default_factory=dict)
+
+    def rate_limiter(self, host: str) -> RateLimiter:
+        """Create the rate limiter for the requests to ``host``."""
+        rate = self.rate_limit
+        if rate is None:
+            rate = DEFAULT_RATE_LIMITS.get(host, 0)
+        return RateLimiter(
+            server=(
+                TokenBucket(rate, burst=self.rate_limit_burst or rate)
+                if rate > 0
+                else None
+            ),
+            endpoints={
+                path: TokenBucket(endpoint_rate, burst=endpoint_rate)
+                for path, endpoint_rate in self.endpoint_rate_limits.items()
+                if endpoint_rate > 0
+            },
         )
+
+
+#: configuration of all clients created via :py:func:`get_client`
+CLIENT_CONFIG = ClientConfig()
+
+_CLIENTS: dict[tuple[str, str], NoWaitClient] = {}
+_RATE_LIMITERS: dict[str, RateLimiter] = {}
+_CLIENTS_LOCK = Lock()
+
+
+def get_client(server: str, scheme: str = "") -> NoWaitClient:
+    """Returns the client for the openQA instance ``server``.
+
+    All callers share one client per ``(server, scheme)``, so that its
+    connections are kept alive and reused across the whole process, and all
+    clients of the same host share one rate limiter.
+    """
+    with _CLIENTS_LOCK:
+        if (client := _CLIENTS.get((server, scheme))) is None:
+            client = _CLIENTS[(server, scheme)] = NoWaitClient(
+                server=server,
+                scheme=scheme,
+                pool_size=CLIENT_CONFIG.pool_size,
+                retry_policy=CLIENT_CONFIG.retry_policy,
+                circuit_breaker=CircuitBreaker(
+                    failure_threshold=CLIENT_CONFIG.circuit_breaker_threshold,
+                    reset_timeout=CLIENT_CONFIG.circuit_breaker_timeout,
+                ),
+            )
+            host = urlsplit(client.baseurl).netloc
+            if (limiter := _RATE_LIMITERS.get(host)) is None:
+                limiter = _RATE_LIMITERS[host] = CLIENT_CONFIG.rate_limiter(
+                    host
+                )
+            client.rate_limiter = limiter
+        return client
@@ -25,7 +25,7 @@ template for the kiwi job group (see :py:const:`KIWI_JOB_TEMPLATE`).
 """
 
 from itertools import product
-from typing import Dict, List, Tuple, Union
+from typing import Any, Callable, Dict, List, Tuple, Union
 
 from launcher.types import Product, TestSuite
 from launcher.image_tests import DistroTest, ObsImagePackage
@@ -154,14 +154,19 @@ KIWI_FLAVORS = [
 #: All products that we use in the kiwi test suite.
 #: We create one product for all permutations of $flavor, $distri and $version
 #: from :ref:`KIWI_FLAVORS` and :ref:`KIWI_DISTRO_MATRIX`
-KIWI_PRODUCTS: List[Product] = [
-    Product(version=version, distri=distri, flavor=flavor)
-    for flavor in KIWI_FLAVORS
-    for version, distri in KIWI_DISTRO_MATRIX
-]
+KIWI_PRODUCTS: List[Product]
+
+
+def _kiwi_products() -> List[Product]:
+    return [
+        Product(version=version, distri=distri, flavor=flavor)
+        for flavor in KIWI_FLAVORS
+        for version, distri in KIWI_DISTRO_MATRIX
+    ]
 
 
-#: The YAML schedule of the kiwi job group
+#: The schedule of the kiwi job group as the data structure that the
+#: ``JobTemplates-01.yaml`` schema describes
 #:
 #: This is the part that is responsible for scheduling test suites for
 #: products. We perform that as follows:
@@ -173,94 +178,113 @@ KIWI_PRODUCTS: List[Product] = [
 #:   just boots from these
 #: - for live isos we schedule the `kiwi_live_image_test` suite.
 #:
-#: We auto-generate this YAML schedule for each version & distri combination in
+#: We auto-generate this schedule for each version & distri combination in
 #: :ref:`KIWI_DISTRO_MATRIX`.
-KIWI_JOB_TEMPLATE = (
-    """defaults:
-  x86_64:
-    machine: 64bit
-    priority: 60
-
-products:"""
-    + "\n".join(
-        f"""
-  kiwi-{distri}-{version}-live-iso-x86_64:
-    distri: {distri}
-    version: {version}
-    flavor: kiwi-test-iso
-  kiwi-{distri}-{version}-live-iso-x86_64-efi:
-    distri: {distri}
-    version: {version}
-    flavor: kiwi-test-iso-efi
-  kiwi-{distri}-{version}-install-iso-x86_64:
-    distri: {distri}
-    version: {version}
-    flavor: kiwi-install-iso
-  kiwi-{distri}-{version}-install-iso-x86_64-efi:
-    distri: {distri}
-    version: {version}
-    flavor: kiwi-install-iso-efi
-  kiwi-{distri}-{version}-disk-x86_64:
-    distri: {distri}
-    version: {version}
-    flavor: kiwi-test-disk
-  kiwi-{distri}-{version}-disk-x86_64-efi:
-    distri: {distri}
-    version: {version}
-    flavor: kiwi-test-disk-efi
-"""
-        for version, distri in KIWI_DISTRO_MATRIX
-    )
-    + """
-scenarios:
-  x86_64:
-"""
-    + "\n".join(
-        f"""
-    kiwi-{distri}-{version}-live-iso-x86_64:
-      - kiwi_live_image_test:
-          description: {KIWI_TEST_SUITES['kiwi_live_image_test']['description']} for {distri} {version}
-
-    kiwi-{distri}-{version}-live-iso-x86_64-efi:
-      - kiwi_live_image_test_efi:
-          description: {KIWI_TEST_SUITES['kiwi_live_image_test_efi']['description']} for {distri} {version}
-
-    kiwi-{distri}-{version}-install-iso-x86_64:
-      - kiwi_live_image_test:
-          description: {KIWI_TEST_SUITES['kiwi_live_image_test']['description']} for {distri} {version}
-          settings:
-            PUBLISH_HDD_1: "kiwi-%DISTRI%-%VERSION%-%PACKAGE%-%ARCH%-%BUILD%-non-efi.qcow2"
-
-      - kiwi_disk_image_test:
-          description: {KIWI_TEST_SUITES['kiwi_disk_image_test']['description']} for {distri} {version}
-          settings:
-            HDD_1: "kiwi-%DISTRI%-%VERSION%-%PACKAGE%-%ARCH%-%BUILD%-non-efi.qcow2"
-            START_AFTER_TEST: kiwi_live_image_test
-
-    kiwi-{distri}-{version}-install-iso-x86_64-efi:
-      - kiwi_live_image_test_efi:
-          description: {KIWI_TEST_SUITES['kiwi_live_image_test_efi']['description']} for {distri} {version}
-          settings:
-            PUBLISH_HDD_1: "kiwi-%DISTRI%-%VERSION%-%PACKAGE%-%ARCH%-%BUILD%-efi.qcow2"
-
-      - kiwi_disk_image_test_efi:
-          description: {KIWI_TEST_SUITES['kiwi_disk_image_test_efi']['description']} for {distri} {version}
-          settings:
-            HDD_1: "kiwi-%DISTRI%-%VERSION%-%PACKAGE%-%ARCH%-%BUILD%-efi.qcow2"
-            START_AFTER_TEST: kiwi_live_image_test_efi
-
-    kiwi-{distri}-{version}-disk-x86_64:
-      - kiwi_disk_image_test:
-          description: {KIWI_TEST_SUITES['kiwi_disk_image_test']['description']} for {distri} {version}
-
-    kiwi-{distri}-{version}-disk-x86_64-efi:
-      - kiwi_disk_image_test_efi:
-          description: {KIWI_TEST_SUITES['kiwi_disk_image_test_efi']['description']} for {distri} {version}
+KIWI_JOB_TEMPLATE_DATA: Dict[str, Any]
+
+
+def _kiwi_job_template_data() -> Dict[str, Any]:
+    def scenario(
+        test_suite: str, distri: str, version: str, **settings: str
+    ) -> Dict[str, Any]:
+        description = KIWI_TEST_SUITES[test_suite]["description"]
+        entry: Dict[str, Any] = {
+            "description": f"{description} for {distri} {version}"
+        }
+        if settings:
+            entry["settings"] = settings
+        return {test_suite: entry}
+
+    hdd = "kiwi-%DISTRI%-%VERSION%-%PACKAGE%-%ARCH%-%BUILD%-{}.qcow2"
+    products: Dict[str, Dict[str, str]] = {}
+    scenarios: Dict[str, List[Dict[str, Any]]] = {}
+    for version, distri in KIWI_DISTRO_MATRIX:
+        prefix = f"kiwi-{distri}-{version}"
+        for name, flavor in (
+            ("live-iso-x86_64", "kiwi-test-iso"),
+            ("live-iso-x86_64-efi", "kiwi-test-iso-efi"),
+            ("install-iso-x86_64", "kiwi-install-iso"),
+            ("install-iso-x86_64-efi", "kiwi-install-iso-efi"),
+            ("disk-x86_64", "kiwi-test-disk"),
+            ("disk-x86_64-efi", "kiwi-test-disk-efi"),
+        ):
+            products[f"{prefix}-{name}"] = {
+                "distri": distri,
+                "version": version,
+                "flavor": flavor,
+            }
 
-"""
-        for version, distri in KIWI_DISTRO_MATRIX
+        scenarios[f"{prefix}-live-iso-x86_64"] = [
+            scenario("kiwi_live_image_test", distri, version)
+        ]
+        scenarios[f"{prefix}-live-iso-x86_64-efi"] = [
+            scenario("kiwi_live_image_test_efi", distri, version)
+        ]
+        for efi, suffix in (("", "non-efi"), ("_efi", "efi")):
+            scenarios[
+                f"{prefix}-install-iso-x86_64{efi.replace('_', '-')}"
+            ] = [
+                scenario(
+                    f"kiwi_live_image_test{efi}",
+                    distri,
+                    version,
+                    PUBLISH_HDD_1=hdd.format(suffix),
+                ),
+                scenario(
+                    f"kiwi_disk_image_test{efi}",
+                    distri,
+                    version,
+                    HDD_1=hdd.format(suffix),
+                    START_AFTER_TEST=f"kiwi_live_image_test{efi}",
+                ),
+            ]
+        scenarios[f"{prefix}-disk-x86_64"] = [
+            scenario("kiwi_disk_image_test", distri, version)
+        ]
+        scenarios[f"{prefix}-disk-x86_64-efi"] = [
+            scenario("kiwi_disk_image_test_efi", distri, version)
+        ]
+
+    return {
+        "defaults": {"x86_64": {"machine": "64bit", "priority": 60}},
+        "products": products,
+        "scenarios": {"x86_64": scenarios},
+    }
+
+
+#: The YAML schedule of the kiwi job group, serialized deterministically from
+#: :ref:`KIWI_JOB_TEMPLATE_DATA`
+KIWI_JOB_TEMPLATE: str
+
+
+def _kiwi_job_template() -> str:
+    import yaml  # type: ignore[import-untyped]
+
+    # goes through __getattr__, so that the data is only built once
+    from launcher.constants import KIWI_JOB_TEMPLATE_DATA
+
+    return yaml.safe_dump(
+        KIWI_JOB_TEMPLATE_DATA,
+        sort_keys=False,
+        default_flow_style=False,
+        width=2**16,
     )
-)
+
+
+#: Constants that are only created once they are accessed, as building them is
+#: comparatively expensive and most entry points do not need them
+_LAZY_CONSTANTS: Dict[str, Callable[[], Any]] = {
+    "KIWI_PRODUCTS": _kiwi_products,
+    "KIWI_JOB_TEMPLATE_DATA": _kiwi_job_template_data,
+    "KIWI_JOB_TEMPLATE": _kiwi_job_template,
+}
+
+
+def __getattr__(name: str) -> Any:
+    if (factory := _LAZY_CONSTANTS.get(name)) is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = globals()[name] = factory()
+    return value
 
 
 RAMDISK_EXTRA_PARAMS: Dict[str, Union[str, int]] = {"QEMURAM": 4096}
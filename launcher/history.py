@@ -0,0 +1,354 @@
+"""Local SQLite store of the scheduled builds and of the results of their
+jobs.
+
+``schedule_test_run`` records every build, the ids of its jobs and the image
+tested in each cell of the test matrix, ``monitor`` records the settings,
+results, durations and clones of the finished jobs.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import time
+from typing import Iterable
+
+from launcher.openqa import Job, JobSummary, job_duration
+from launcher.types import Cell, CellImages
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS builds (
+    server TEXT NOT NULL,
+    build TEXT NOT NULL,
+    scheduled_at REAL NOT NULL,
+    PRIMARY KEY (server, build)
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    server TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    build TEXT NOT NULL,
+    distri TEXT,
+    version TEXT,
+    package TEXT,
+    flavor TEXT,
+    arch TEXT,
+    state TEXT,
+    result TEXT,
+    t_started TEXT,
+    t_finished TEXT,
+    duration REAL,
+    PRIMARY KEY (server, id)
+);
+CREATE TABLE IF NOT EXISTS clones (
+    server TEXT NOT NULL,
+    job_id INTEGER NOT NULL,
+    clone_id INTEGER NOT NULL,
+    PRIMARY KEY (server, job_id)
+);
+CREATE TABLE IF NOT EXISTS images (
+    server TEXT NOT NULL,
+    build TEXT NOT NULL,
+    distri TEXT NOT NULL,
+    version TEXT NOT NULL,
+    package TEXT NOT NULL,
+    arch TEXT NOT NULL,
+    flavor TEXT NOT NULL,
+    binary TEXT NOT NULL,
+    sha256 TEXT,
+    PRIMARY KEY (server, build, distri, version, package, arch, flavor)
+);
+CREATE INDEX IF NOT EXISTS jobs_build ON jobs (server, build);
+CREATE INDEX IF NOT EXISTS jobs_distri_version ON jobs (distri, version);
+CREATE INDEX IF NOT EXISTS jobs_package ON jobs (package);
+CREATE INDEX IF NOT EXISTS jobs_flavor ON jobs (flavor);
+"""
+
+
+def default_history_path() -> str:
+    """Path of the history database if none is specified explicitly."""
+    return os.path.join(
+        os.environ.get("XDG_DATA_HOME")
+        or os.path.join(os.path.expanduser("~"), ".local", "share"),
+        "kiwi-functional-tests",
+        "history.sqlite",
+    )
+
+
+class BuildHistory:
+    """The history of all builds stored in the SQLite database in ``path``."""
+
+    def __init__(self, path: str) -> None:
+        if (dirname := os.path.dirname(path)) and path != ":memory:":
+            os.makedirs(dirname, exist_ok=True)
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> BuildHistory:
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def record_build(
+        self, server: str, build: str, job_ids: Iterable[int]
+    ) -> None:
+        """Record that the jobs with the ids ``job_ids`` have been scheduled
+        as part of ``build``.
+        """
+        with self._connection:
+            self._connection.execute(
+                """INSERT INTO builds (server, build, scheduled_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT (server, build)
+                DO UPDATE SET scheduled_at = excluded.scheduled_at""",
+                (server, build, time.time()),
+            )
+            self._connection.executemany(
+                """INSERT INTO jobs (server, id, build, state)
+                VALUES (?, ?, ?, 'scheduled')
+                ON CONFLICT (server, id) DO NOTHING""",
+                ((server, job_id, build) for job_id in job_ids),
+            )
+
+    def record_images(
+        self, server: str, build: str, images: CellImages
+    ) -> None:
+        """Record the name and the checksum of the image that ``build``
+        tests in each cell.
+        """
+        with self._connection:
+            self._connection.executemany(
+                """INSERT INTO images (
+                    server, build, distri, version, package, arch, flavor,
+                    binary, sha256
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (
+                    server, build, distri, version, package, arch, flavor
+                ) DO UPDATE SET
+                    binary = excluded.binary,
+                    sha256 = excluded.sha256""",
+                (
+                    (server, build, *cell, binary, sha256)
+                    for cell, (binary, sha256) in images.items()
+                ),
+            )
+
+    def record_jobs(
+        self, server: str, build: str, jobs: Iterable[Job | JobSummary]
+    ) -> None:
+        """Record the settings, state and result of ``jobs`` as well as the
+        ids of their clones.
+        """
+        jobs = list(jobs)
+        with self._connection:
+            self._connection.executemany(
+                """INSERT INTO jobs (
+                    server, id, build, distri, version, package, flavor, arch,
+                    state, result, t_started, t_finished, duration
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (server, id) DO UPDATE SET
+                    build = excluded.build,
+                    distri = excluded.distri,
+                    version = excluded.version,
+                    package = excluded.package,
+                    flavor = excluded.flavor,
+                    arch = excluded.arch,
+                    state = excluded.state,
+                    result = excluded.result,
+                    t_started = excluded.t_started,
+                    t_finished = excluded.t_finished,
+                    duration = excluded.duration""",
+                (
+                    (
+                        server,
+                        job.id,
+                        job.settings.get("BUILD", build),
+                        job.settings.get("DISTRI"),
+                        job.settings.get("VERSION"),
+                        job.settings.get("PACKAGE"),
+                        job.settings.get("FLAVOR"),
+                        job.settings.get("ARCH"),
+                        str(job.state),
+                        str(job.result),
+                        job.t_started,
+                        job.t_finished,
+                        job_duration(job),
+                    )
+                    for job in jobs
+                ),
+            )
+            self._connection.executemany(
+                """INSERT INTO clones (server, job_id, clone_id)
+                VALUES (?, ?, ?)
+                ON CONFLICT (server, job_id)
+                DO UPDATE SET clone_id = excluded.clone_id""",
+                (
+                    (server, job.id, job.clone_id)
+                    for job in jobs
+                    if job.clone_id
+                ),
+            )
+
+    def durations(
+        self,
+        distri: str | None = None,
+        version: str | None = None,
+        flavor: str | None = None,
+    ) -> list[tuple[str, str, str, int, float, float, float]]:
+        """Returns the number of finished jobs and their average, minimum and
+        maximum duration in seconds for each distri, version & flavor,
+        optionally restricted to the supplied ones.
+        """
+        return self._connection.execute(
+            """SELECT distri, version, flavor, COUNT(*), AVG(duration),
+                MIN(duration), MAX(duration)
+            FROM jobs
+            WHERE duration IS NOT NULL
+                AND (?1 IS NULL OR distri = ?1)
+                AND (?2 IS NULL OR version = ?2)
+                AND (?3 IS NULL OR flavor = ?3)
+            GROUP BY distri, version, flavor
+            ORDER BY distri, version, flavor""",
+            (distri, version, flavor),
+        ).fetchall()
+
+    def failed_jobs(
+        self, last_builds: int = 10
+    ) -> list[tuple[str, str, str, str, str, str, int]]:
+        """Returns the build, distri, version, package, flavor, result and id
+        of all failed jobs (that have not been cloned) from the
+        ``last_builds`` most recently scheduled builds.
+        """
+        return self._connection.execute(
+            """SELECT jobs.build, distri, version, package, flavor, result,
+                jobs.id
+            FROM jobs
+            JOIN (
+                SELECT server, build FROM builds
+                ORDER BY scheduled_at DESC LIMIT ?
+            ) AS recent
+            ON jobs.server = recent.server AND jobs.build = recent.build
+            LEFT JOIN clones
+            ON clones.server = jobs.server AND clones.job_id = jobs.id
+            WHERE clones.clone_id IS NULL
+                AND result NOT IN (
+                    'scheduled', 'softfailed', 'passed', 'none',
+                    'parallel_restarted', 'user_restarted'
+                )
+            ORDER BY recent.build DESC, distri, version, package, flavor""",
+            (last_builds,),
+        ).fetchall()
+
+    def last_images(self, server: str) -> dict[Cell, tuple[str | None, bool]]:
+        """Returns the checksum of the image that was tested in the most
+        recently scheduled build on ``server`` of each cell and whether all
+        jobs (that have not been cloned) of the cell passed in that build.
+
+        Cells without recorded results of that build are omitted.
+        """
+        rows = self._connection.execute(
+            """WITH latest AS (
+                SELECT images.*, ROW_NUMBER() OVER (
+                    PARTITION BY server, distri, version, package, arch,
+                        flavor
+                    ORDER BY builds.scheduled_at DESC
+                ) AS position
+                FROM images JOIN builds USING (server, build)
+                WHERE server = ?
+            )
+            SELECT latest.distri, latest.version, latest.package,
+                latest.arch, latest.flavor, latest.sha256,
+                SUM(COALESCE(jobs.result, 'none')
+                    NOT IN ('passed', 'softfailed'))
+            FROM latest
+            JOIN jobs
+            ON jobs.server = latest.server AND jobs.build = latest.build
+                AND jobs.distri = latest.distri
+                AND jobs.version = latest.version
+                AND jobs.package = latest.package
+                AND jobs.arch = latest.arch
+                AND jobs.flavor = latest.flavor
+            LEFT JOIN clones
+            ON clones.server = jobs.server AND clones.job_id = jobs.id
+            WHERE latest.position = 1 AND clones.clone_id IS NULL
+            GROUP BY latest.distri, latest.version, latest.package,
+                latest.arch, latest.flavor, latest.sha256""",
+            (server,),
+        ).fetchall()
+        return {
+            (distri, version, package, arch, flavor): (sha256, not failed)
+            for distri, version, package, arch, flavor, sha256, failed in rows
+        }
+
+
+def main() -> None:
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(
+        "kiwi-build-history",
+        description="Query the history of the scheduled kiwi test builds",
+    )
+    parser.add_argument(
+        "--history",
+        help=f"""Path to the history database.
+Defaults to {default_history_path()}""",
+        nargs=1,
+        default=[default_history_path()],
+        type=str,
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    durations_parser = subparsers.add_parser(
+        "durations", help="print the durations of the finished jobs"
+    )
+    for option in ("--distri", "--version", "--flavor"):
+        durations_parser.add_argument(
+            option, nargs=1, default=[None], type=str
+        )
+
+    failures_parser = subparsers.add_parser(
+        "failures", help="print the failed jobs of the last builds"
+    )
+    failures_parser.add_argument(
+        "-n",
+        "--last-builds",
+        help="Number of builds to consider. Defaults to 10.",
+        nargs=1,
+        default=[10],
+        type=int,
+    )
+
+    args = parser.parse_args()
+
+    with BuildHistory(args.history[0]) as history:
+        if args.command == "durations":
+            print(
+                "distri | version | flavor | jobs | avg [s] | min [s] | max [s]"
+            )
+            print(
+                "-------|---------|--------|------|---------|---------|--------"
+            )
+            for (
+                distri,
+                version,
+                flavor,
+                count,
+                avg,
+                low,
+                high,
+            ) in history.durations(
+                args.distri[0], args.version[0], args.flavor[0]
+            ):
+                print(
+                    f"{distri} | {version} | {flavor} | {count} | {avg:.0f} | "
+                    f"{low:.0f} | {high:.0f}"
+                )
+        else:
+            print("build | distri | version | package | flavor | result | job")
+            print("------|--------|---------|---------|--------|--------|----")
+            for row in history.failed_jobs(args.last_builds[0]):
+                print(" | ".join(str(column) for column in row))
@@ -1,17 +1,40 @@
 from __future__ import annotations
 
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Dict, Literal, List, Union
+from hashlib import sha256
+from tempfile import NamedTemporaryFile
+from threading import Lock
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Literal,
+    List,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
-from osc import core
-from openqa_client.client import OpenQA_Client
+from launcher.metrics import METRICS
+from launcher.types import Cell, CellImages, JobScheduledReply
 
-from launcher.types import JobScheduledReply
+if TYPE_CHECKING:
+    from openqa_client.client import OpenQA_Client
 
 
 API_URL = "https://api.opensuse.org/"
 
+#: default maximum age in seconds of the binary listings cached on disk
+DEFAULT_OBS_CACHE_TTL = 900
+
+_KeyT = TypeVar("_KeyT", bound=Tuple[str, ...])
+
 
 class Arch(Enum):
     x86_64 = "x86_64"
@@ -38,6 +61,213 @@ class EfiTestSuiteType(Enum):
         return self.value
 
 
+def default_obs_cache_dir() -> str:
+    """Directory in which the OBS binary listings are cached across runs."""
+    return os.path.join(
+        os.environ.get("XDG_CACHE_HOME")
+        or os.path.join(os.path.expanduser("~"), ".cache"),
+        "kiwi-functional-tests",
+        "obs",
+    )
+
+
+@dataclass
+class ObsBinaryListCache:
+    """Memoizes the binary listings fetched from OBS for the duration of a
+    run, so that each distinct listing is only requested once.
+
+    If ``cache_dir`` is set, then the listings are additionally persisted in
+    that directory and reused by later runs as long as they are younger than
+    ``ttl`` seconds. In ``offline`` mode, the persisted listings are used
+    regardless of their age and OBS is never contacted.
+    """
+
+    #: directory in which the listings are persisted, None disables the
+    #: on-disk cache
+    cache_dir: str | None = None
+    #: maximum age in seconds of a persisted listing
+    ttl: float = DEFAULT_OBS_CACHE_TTL
+    #: only use the persisted listings
+    offline: bool = False
+    #: URL of the OBS API from which the listings are fetched
+    api_url: str = API_URL
+
+    #: number of listings that were served from the cache
+    hits: int = 0
+    #: number of listings that were served from the on-disk cache
+    disk_hits: int = 0
+    #: number of listings that had to be fetched from OBS
+    misses: int = 0
+
+    _binaries: Dict[Tuple[str, str, str, str], List[str]] = field(
+        default_factory=dict, repr=False
+    )
+    _published: Dict[Tuple[str, str, str], List[str]] = field(
+        default_factory=dict, repr=False
+    )
+    _checksums: Dict[Tuple[str, str, str, str, str], List[str]] = field(
+        default_factory=dict, repr=False
+    )
+    _lock: Lock = field(default_factory=Lock, repr=False)
+    _key_locks: Dict[Tuple[str, ...], Lock] = field(
+        default_factory=dict, repr=False
+    )
+
+    def _lookup(
+        self,
+        listings: Dict[_KeyT, List[str]],
+        key: _KeyT,
+        fetch: Callable[[], List[str]],
+    ) -> List[str]:
+        # every key gets its own lock, so that concurrent lookups of the same
+        # listing result in a single request while different listings can be
+        # fetched in parallel
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, Lock())
+
+        with key_lock:
+            if key in listings:
+                with self._lock:
+                    self.hits += 1
+                return listings[key]
+
+            if (binaries := self._load(key)) is not None:
+                with self._lock:
+                    self.disk_hits += 1
+            elif self.offline:
+                raise RuntimeError(
+                    f"No cached binary listing for {'/'.join(key)} "
+                    "available in offline mode"
+                )
+            else:
+                binaries = fetch()
+                self._store(key, binaries)
+                with self._lock:
+                    self.misses += 1
+
+            with self._lock:
+                listings[key] = binaries
+            return binaries
+
+    def _cache_file(self, key: Tuple[str, ...]) -> str:
+        assert self.cache_dir is not None
+        digest = sha256(json.dumps([self.api_url, *key]).encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def _load(self, key: Tuple[str, ...]) -> List[str] | None:
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self._cache_file(key), "r") as cache_file:
+                entry = json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+
+        if not self.offline and time.time() - entry["fetched"] > self.ttl:
+            return None
+        return entry["binaries"]
+
+    def _store(self, key: Tuple[str, ...], binaries: List[str]) -> None:
+        if self.cache_dir is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # write into a temporary file first so that concurrent runs never
+        # read a partially written entry
+        with NamedTemporaryFile(
+            "w", dir=self.cache_dir, suffix=".tmp", delete=False
+        ) as tmp_file:
+            json.dump(
+                {"key": key, "fetched": time.time(), "binaries": binaries},
+                tmp_file,
+            )
+        os.replace(tmp_file.name, self._cache_file(key))
+
+    def get_binarylist(
+        self, project: str, repository: str, arch: str, package: str
+    ) -> List[str]:
+        """Returns the binaries built for ``package`` in the repository."""
+        # osc is slow to import, so only load it once it is actually needed
+        from osc import core
+
+        def fetch() -> List[str]:
+            with METRICS.timed("obs", "GET", "build"):
+                return core.get_binarylist(
+                    self.api_url, project, repository, arch, package
+                )
+
+        return self._lookup(
+            self._binaries, (project, repository, arch, package), fetch
+        )
+
+    def get_binarylist_published(
+        self, project: str, repository: str, subdir: str
+    ) -> List[str]:
+        """Returns the published binaries in the subdirectory of the
+        repository.
+        """
+        from osc import core
+
+        def fetch() -> List[str]:
+            with METRICS.timed("obs", "GET", "published"):
+                return core.get_binarylist_published(
+                    self.api_url, project, repository, subdir
+                )
+
+        return self._lookup(
+            self._published, (project, repository, subdir), fetch
+        )
+
+    def get_published_sha256(
+        self, project: str, repository: str, subdir: str, binary: str
+    ) -> str | None:
+        """Returns the sha256 checksum of the published ``binary`` from the
+        ``.sha256`` file next to it or None if no such file is published.
+        """
+        checksum_file = f"{binary}.sha256"
+        if checksum_file not in self.get_binarylist_published(
+            project, repository, subdir
+        ):
+            return None
+
+        from osc import core
+
+        def fetch() -> List[str]:
+            path = ["published", project, repository]
+            path += [subdir, checksum_file] if subdir else [checksum_file]
+            with METRICS.timed("obs", "GET", "published/sha256"):
+                contents = core.http_GET(core.makeurl(self.api_url, path))
+                return [parse_sha256(contents.read().decode(), binary)]
+
+        # the checksum file is cached like a listing with a single entry
+        return self._lookup(
+            self._checksums,
+            ("sha256", project, repository, subdir, binary),
+            fetch,
+        )[0]
+
+
+_SHA256_LINE = re.compile(r"^([0-9a-fA-F]{64}) [ *]?(\S+)$", re.MULTILINE)
+
+
+def parse_sha256(contents: str, binary: str) -> str:
+    """Extract the checksum of ``binary`` from the contents of a (possibly
+    signed) checksum file in the format of sha256sum.
+    """
+    checksums = {
+        os.path.basename(name): checksum.lower()
+        for checksum, name in _SHA256_LINE.findall(contents)
+    }
+    if binary in checksums:
+        return checksums[binary]
+    if len(checksums) == 1:
+        return checksums.popitem()[1]
+    raise RuntimeError(f"No sha256 checksum of {binary} found in {contents}")
+
+
+#: Cache of the OBS binary listings that is shared by all packages & tests
+OBS_BINARY_LIST_CACHE = ObsBinaryListCache()
+
+
 def get_efi_testsuite(test_suite: TestSuiteType) -> EfiTestSuiteType:
     return {
         TestSuiteType.DISK_IMAGE: EfiTestSuiteType.DISK_IMAGE,
@@ -101,11 +331,13 @@ class ObsImagePackage:
             **kwargs,
         )
 
-    def get_download_url(self, use_https: bool) -> str:
+    def get_published_binary(
+        self, cache: ObsBinaryListCache = OBS_BINARY_LIST_CACHE
+    ) -> str:
+        """Returns the name of the published image of this package."""
         binaries_of_pkg = [
             binary
-            for binary in core.get_binarylist(
-                API_URL,
+            for binary in cache.get_binarylist(
                 self.project,
                 self.repository,
                 str(self.arch),
@@ -117,8 +349,8 @@ class ObsImagePackage:
             or binary[-4:] == ".raw"
         ]
 
-        published_binaries = core.get_binarylist_published(
-            API_URL, self.project, self.repository, self.subdir
+        published_binaries = cache.get_binarylist_published(
+            self.project, self.repository, self.subdir
         )
 
         published_binaries_of_pkg = set(binaries_of_pkg).intersection(
@@ -154,6 +386,14 @@ class ObsImagePackage:
                     + binary
                 )
 
+        return binary
+
+    def get_download_url(
+        self,
+        use_https: bool,
+        cache: ObsBinaryListCache = OBS_BINARY_LIST_CACHE,
+    ) -> str:
+        binary = self.get_published_binary(cache)
         return (
             f"http{'s' if use_https else ''}://download.opensuse.org/repositories"
             f"/{self.project.replace(':', ':/')}/{self.repository}"
@@ -233,6 +473,37 @@ def get_uefi_pflash(openqa_host_os: OpenqaHostOsT) -> UefiPflash:
         )
 
 
+@dataclass
+class JobSubmissionFailure:
+    params: Dict[str, Union[str, int]]
+    error: Exception
+
+    def __str__(self) -> str:
+        return (
+            f"Failed to schedule {self.params.get('PACKAGE')} "
+            f"({self.params.get('FLAVOR')}) for {self.params.get('DISTRI')} "
+            f"{self.params.get('VERSION')}, got {self.error}"
+        )
+
+
+class JobSubmissionError(RuntimeError):
+    """Raised by :py:meth:`DistroTest.trigger_tests` if some jobs could not
+    be scheduled.
+    """
+
+    def __init__(
+        self,
+        launched_jobs: List[JobScheduledReply],
+        failures: List[JobSubmissionFailure],
+    ) -> None:
+        super().__init__(
+            f"Failed to schedule {len(failures)} jobs:\n"
+            + "\n".join(str(failure) for failure in failures)
+        )
+        self.launched_jobs = launched_jobs
+        self.failures = failures
+
+
 @dataclass
 class DistroTest:
     distri: str
@@ -262,14 +533,15 @@ class DistroTest:
             "HDDSIZEGB_1": 20,
         }
 
-    def trigger_tests(
+    def build_params(
         self,
-        client: OpenQA_Client,
         casedir: str,
         build: str,
-        dry_run: bool = False,
         openqa_host_os: OpenqaHostOsT = "opensuse",
-    ) -> List[JobScheduledReply]:
+    ) -> List[Dict[str, Union[str, int]]]:
+        """Returns the parameters of the ``POST isos`` requests of all
+        packages, one per package and one more per package in EFI mode.
+        """
         all_params = []
         for pkg in self.packages:
             all_params.append(
@@ -284,17 +556,214 @@ class DistroTest:
                 efi_params["UEFI_PFLASH_CODE"] = uefi_pflash.code
                 efi_params["UEFI_PFLASH_VARS"] = uefi_pflash.vars
                 all_params.append({**efi_params})
+        return all_params
 
-        launched_jobs = []
-
-        for param_dict in all_params:
-            if dry_run:
+    @staticmethod
+    def submit_params(
+        client: OpenQA_Client | None,
+        all_params: List[Dict[str, Union[str, int]]],
+        dry_run: bool = False,
+        max_workers: int = 1,
+    ) -> List[JobScheduledReply]:
+        """Schedule a job for each parameter set in ``all_params`` on openQA,
+        sending at most ``max_workers`` requests in parallel.
+
+        If some of the jobs could not be scheduled, then all remaining jobs
+        are still submitted and a :py:class:`JobSubmissionError` is raised
+        afterwards, which contains the replies of the successfully scheduled
+        jobs and the failures.
+
+        ``client`` may only be None in dry run mode.
+        """
+        if dry_run:
+            for param_dict in all_params:
                 print("POST", "isos", param_dict)
-            else:
-                launched_jobs.append(
-                    client.openqa_request(
-                        "POST", "isos", param_dict, retries=0
-                    )
-                )
+            return []
+
+        assert client is not None
+
+        def submit(
+            param_dict: Dict[str, Union[str, int]]
+        ) -> JobScheduledReply | JobSubmissionFailure:
+            try:
+                return client.openqa_request("POST", "isos", param_dict)
+            except Exception as exc:
+                return JobSubmissionFailure(param_dict, exc)
+
+        launched_jobs: List[JobScheduledReply] = []
+        failures: List[JobSubmissionFailure] = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # map() preserves the order of all_params
+            for reply in executor.map(submit, all_params):
+                if isinstance(reply, JobSubmissionFailure):
+                    failures.append(reply)
+                else:
+                    launched_jobs.append(reply)
+
+        if failures:
+            raise JobSubmissionError(launched_jobs, failures)
 
         return launched_jobs
+
+    def trigger_tests(
+        self,
+        client: OpenQA_Client | None,
+        casedir: str,
+        build: str,
+        dry_run: bool = False,
+        openqa_host_os: OpenqaHostOsT = "opensuse",
+        max_workers: int = 1,
+    ) -> List[JobScheduledReply]:
+        """Schedule the tests of all packages on openQA, see
+        :py:meth:`build_params` and :py:meth:`submit_params`.
+        """
+        return DistroTest.submit_params(
+            client,
+            self.build_params(casedir, build, openqa_host_os=openqa_host_os),
+            dry_run=dry_run,
+            max_workers=max_workers,
+        )
+
+
+@dataclass
+class DownloadUrlFailure:
+    package: ObsImagePackage
+    error: Exception
+
+    def __str__(self) -> str:
+        return (
+            f"Failed to resolve the download url of {self.package.package} "
+            f"({self.package.project}/{self.package.repository}), "
+            f"got {self.error}"
+        )
+
+
+def resolve_download_urls(
+    tests: List[DistroTest],
+    max_workers: int = 8,
+    cache: ObsBinaryListCache = OBS_BINARY_LIST_CACHE,
+) -> None:
+    """Resolve the download urls of all packages of ``tests`` in parallel
+    using at most ``max_workers`` threads, thereby populating ``cache`` for
+    the subsequent calls of :py:meth:`DistroTest.trigger_tests`.
+
+    All failures are collected and reported together via a single
+    :py:class:`RuntimeError`.
+    """
+    packages: Dict[Tuple[str, ...], Tuple[ObsImagePackage, bool]] = {}
+    for test in tests:
+        for pkg in test.packages:
+            packages.setdefault(
+                (
+                    pkg.project,
+                    pkg.repository,
+                    pkg.subdir,
+                    str(pkg.arch),
+                    pkg.package,
+                    str(pkg.test_suite),
+                ),
+                (pkg, test.use_https_for_asset_download),
+            )
+
+    def resolve(
+        pkg_and_https: Tuple[ObsImagePackage, bool]
+    ) -> DownloadUrlFailure | None:
+        pkg, use_https = pkg_and_https
+        try:
+            pkg.get_download_url(use_https, cache=cache)
+        except Exception as exc:
+            return DownloadUrlFailure(pkg, exc)
+        return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        failures = [
+            failure
+            for failure in executor.map(resolve, packages.values())
+            if failure is not None
+        ]
+
+    if failures:
+        raise RuntimeError(
+            f"Failed to resolve {len(failures)} download urls:\n"
+            + "\n".join(str(failure) for failure in failures)
+        )
+
+
+def resolve_published_images(
+    tests: List[DistroTest],
+    max_workers: int = 8,
+    cache: ObsBinaryListCache = OBS_BINARY_LIST_CACHE,
+    checksums_required: bool = False,
+) -> Dict[Tuple[str, str, str, str], Tuple[str, str | None]]:
+    """Resolve the name and the sha256 checksum of the published image of
+    every package of ``tests`` in parallel using at most ``max_workers``
+    threads, keyed by the distri, version, package and arch of the tests.
+
+    The checksum of an image is None if it cannot be fetched, unless
+    ``checksums_required`` is set, in which case this is a failure. All
+    failures are collected and reported together via a single
+    :py:class:`RuntimeError`.
+    """
+    packages = {
+        (test.distri, test.version, pkg.package, str(pkg.arch)): pkg
+        for test in tests
+        for pkg in test.packages
+    }
+
+    def resolve(
+        pkg: ObsImagePackage,
+    ) -> Tuple[str, str | None] | DownloadUrlFailure:
+        try:
+            binary = pkg.get_published_binary(cache)
+        except Exception as exc:
+            return DownloadUrlFailure(pkg, exc)
+        try:
+            return binary, cache.get_published_sha256(
+                pkg.project, pkg.repository, pkg.subdir, binary
+            )
+        except Exception as exc:
+            if checksums_required:
+                return DownloadUrlFailure(pkg, exc)
+            return binary, None
+
+    images: Dict[Tuple[str, str, str, str], Tuple[str, str | None]] = {}
+    failures: List[DownloadUrlFailure] = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for key, image in zip(
+            packages, executor.map(resolve, packages.values())
+        ):
+            if isinstance(image, DownloadUrlFailure):
+                failures.append(image)
+            else:
+                images[key] = image
+
+    if failures:
+        raise RuntimeError(
+            f"Failed to resolve {len(failures)} published images:\n"
+            + "\n".join(str(failure) for failure in failures)
+        )
+    return images
+
+
+def cell_of(params: Dict[str, Union[str, int]]) -> Cell:
+    """Returns the cell of the test matrix of the job scheduled with
+    ``params``.
+    """
+    return (
+        str(params["DISTRI"]),
+        str(params["VERSION"]),
+        str(params["PACKAGE"]),
+        str(params["ARCH"]),
+        str(params["FLAVOR"]),
+    )
+
+
+def cell_images(
+    all_params: List[Dict[str, Union[str, int]]],
+    images: Dict[Tuple[str, str, str, str], Tuple[str, str | None]],
+) -> CellImages:
+    """Returns the published image of the cell of every job in
+    ``all_params`` (see :py:func:`resolve_published_images`).
+    """
+    cells = [cell_of(params) for params in all_params]
+    return {cell: images[cell[:4]] for cell in cells}
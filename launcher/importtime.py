@@ -0,0 +1,150 @@
+"""Measure how long the console scripts of the launcher take to start.
+
+Every entry point is run in a fresh interpreter with ``-X importtime`` and
+``--help``, the cumulative import times of the top level imports are summed
+up and the best of the repeated runs is reported.
+"""
+
+from __future__ import annotations
+
+import re
+import subprocess
+import sys
+from dataclasses import dataclass
+
+
+#: module of every console script of the launcher
+ENTRY_POINTS: dict[str, str] = {
+    "settings": "launcher.settings",
+    "schedule_test_run": "launcher.schedule_test_run",
+    "monitor": "launcher.running_build",
+    "openqa_job": "launcher.openqa",
+    "build_history": "launcher.history",
+}
+
+_IMPORT_TIME_LINE = re.compile(
+    r"^import time:\s+(?P<self>\d+) \|\s+(?P<cumulative>\d+) \|"
+    r"(?P<indent>\s+)(?P<module>\S+)$"
+)
+
+
+@dataclass(frozen=True)
+class ImportTime:
+    """Startup time of a single console script."""
+
+    #: name of the console script
+    name: str
+
+    #: module that provides the ``main()`` function of the script
+    module: str
+
+    #: sum of the cumulative times of all top level imports in ms
+    total_ms: float
+
+    #: the slowest top level imports and their cumulative times in ms
+    slowest: list[tuple[str, float]]
+
+
+def _run_once(module: str) -> dict[str, float]:
+    code = (
+        "import sys; sys.argv = ['launcher', '--help']; "
+        f"from {module} import main; main()"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=False,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(
+            f"Running {module} --help failed with {proc.returncode}: "
+            + proc.stderr[-1000:]
+        )
+
+    top_level: dict[str, float] = {}
+    for line in proc.stderr.splitlines():
+        if (match := _IMPORT_TIME_LINE.match(line)) is None:
+            continue
+        # top level imports are indented by exactly one space
+        if len(match.group("indent")) != 1:
+            continue
+        top_level[match.group("module")] = (
+            int(match.group("cumulative")) / 1000
+        )
+    return top_level
+
+
+def measure(name: str, module: str, repeat: int = 3) -> ImportTime:
+    """Measure the startup time of the console script ``name`` by running it
+    ``repeat`` times and keeping the fastest run.
+    """
+    best: dict[str, float] | None = None
+    for _ in range(max(repeat, 1)):
+        top_level = _run_once(module)
+        if best is None or sum(top_level.values()) < sum(best.values()):
+            best = top_level
+    assert best is not None
+
+    slowest = sorted(best.items(), key=lambda item: item[1], reverse=True)
+    return ImportTime(
+        name=name,
+        module=module,
+        total_ms=sum(best.values()),
+        slowest=slowest[:3],
+    )
+
+
+def main() -> None:
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(
+        "import_benchmark",
+        description="Measure the startup time of the launcher console scripts",
+    )
+    parser.add_argument(
+        "--repeat",
+        help="Run every script this often and report the fastest run",
+        nargs=1,
+        default=[3],
+        type=int,
+    )
+    parser.add_argument(
+        "--max-ms",
+        help="""Exit with 1 if any script takes longer than this many
+milliseconds to start""",
+        nargs=1,
+        default=[None],
+        type=float,
+    )
+    parser.add_argument(
+        "scripts",
+        help="Console scripts to measure, defaults to all of them",
+        nargs="*",
+        default=[],
+    )
+
+    args = parser.parse_args()
+    for name in args.scripts:
+        if name not in ENTRY_POINTS:
+            parser.error(
+                f"unknown script {name}, choose from {', '.join(ENTRY_POINTS)}"
+            )
+
+    too_slow = []
+    for name in args.scripts or ENTRY_POINTS:
+        result = measure(name, ENTRY_POINTS[name], args.repeat[0])
+        slowest = ", ".join(
+            f"{module} {duration:.1f}" for module, duration in result.slowest
+        )
+        print(f"{name:<20} {result.total_ms:8.1f} ms   ({slowest})")
+        if args.max_ms[0] is not None and result.total_ms > args.max_ms[0]:
+            too_slow.append(name)
+
+    if too_slow:
+        print(
+            f"Slower than {args.max_ms[0]} ms: {', '.join(too_slow)}",
+            file=sys.stderr,
+        )
+        sys.exit(1)
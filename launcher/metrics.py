@@ -0,0 +1,220 @@
+"""Instrumentation of the requests to openQA and OBS.
+
+Once :py:attr:`RequestMetrics.enabled` is set, every request that goes
+through :py:class:`launcher.client.NoWaitClient` and every binary listing
+fetched via :py:class:`launcher.image_tests.ObsBinaryListCache` is counted and
+its latency is recorded, keyed by the service, the method and the normalized
+path of the request (e.g. ``GET jobs/{id}``). The response sizes are only
+known for openQA, as osc does not expose the responses of its listings.
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Dict, Iterator, List, Tuple
+
+
+#: upper bounds in seconds of the buckets of the latency histograms
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    float("inf"),
+)
+
+
+def normalize_path(path: str) -> str:
+    """Strip the API prefix from ``path`` and replace all numeric ids in it,
+    so that the requests to different jobs end up in the same bucket.
+
+    >>> normalize_path("/api/v1/jobs/123/cancel")
+    'jobs/{id}/cancel'
+    """
+    path = path.split("?", 1)[0]
+    if path.startswith("/api/v1/"):
+        path = path[len("/api/v1/") :]
+    return re.sub(r"(?<=/)\d+(?=/|$)|^\d+(?=/|$)", "{id}", path.strip("/"))
+
+
+@dataclass
+class EndpointMetrics:
+    """Metrics of the requests to a single endpoint."""
+
+    #: number of requests per HTTP status code or error type
+    statuses: Dict[str, int] = field(default_factory=dict)
+    #: number of requests per bucket of :py:const:`LATENCY_BUCKETS`
+    buckets: List[int] = field(
+        default_factory=lambda: [0] * len(LATENCY_BUCKETS)
+    )
+    #: total time spent in the requests in seconds
+    seconds: float = 0.0
+    #: total size of the response bodies in bytes
+    response_bytes: int = 0
+
+    @property
+    def count(self) -> int:
+        return sum(self.statuses.values())
+
+    def record(self, status: str, seconds: float, size: int) -> None:
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.seconds += seconds
+        self.response_bytes += size
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+
+_Key = Tuple[str, str, str]
+
+
+@dataclass
+class RequestMetrics:
+    """Registry of the metrics of all endpoints."""
+
+    #: only record metrics if set
+    enabled: bool = False
+
+    endpoints: Dict[_Key, EndpointMetrics] = field(default_factory=dict)
+
+    _lock: Lock = field(default_factory=Lock, repr=False)
+
+    def record(
+        self,
+        service: str,
+        method: str,
+        path: str,
+        status: str,
+        seconds: float,
+        size: int = 0,
+    ) -> None:
+        """Record a request of ``service`` (``openqa`` or ``obs``) that took
+        ``seconds`` and returned a body of ``size`` bytes.
+        """
+        if not self.enabled:
+            return
+        key = (service, method, normalize_path(path))
+        with self._lock:
+            self.endpoints.setdefault(key, EndpointMetrics()).record(
+                status, seconds, size
+            )
+
+    @contextmanager
+    def timed(self, service: str, method: str, path: str) -> Iterator[None]:
+        """Record the execution of the wrapped block as a request, which
+        failed if the block raised an exception.
+        """
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except Exception as exc:
+            status = type(exc).__name__
+            raise
+        finally:
+            self.record(
+                service, method, path, status, time.perf_counter() - start
+            )
+
+    def as_dict(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {
+                    "service": service,
+                    "method": method,
+                    "path": path,
+                    "count": metrics.count,
+                    "statuses": dict(metrics.statuses),
+                    "seconds": metrics.seconds,
+                    "response_bytes": metrics.response_bytes,
+                    "latency_buckets": {
+                        str(bound): count
+                        for bound, count in zip(
+                            LATENCY_BUCKETS, metrics.buckets
+                        )
+                    },
+                }
+                for (service, method, path), metrics in sorted(
+                    self.endpoints.items()
+                )
+            ]
+
+    def as_json(self) -> str:
+        return json.dumps(self.as_dict(), indent=2)
+
+    def as_prometheus(self) -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP launcher_requests_total Number of requests per status",
+            "# TYPE launcher_requests_total counter",
+        ]
+        histogram = [
+            "# HELP launcher_request_duration_seconds Latency of the requests",
+            "# TYPE launcher_request_duration_seconds histogram",
+        ]
+        sizes = [
+            "# HELP launcher_response_bytes_total Size of the response bodies",
+            "# TYPE launcher_response_bytes_total counter",
+        ]
+        with self._lock:
+            for (service, method, path), metrics in sorted(
+                self.endpoints.items()
+            ):
+                labels = f'service="{service}",method="{method}",path="{path}"'
+                for status, count in sorted(metrics.statuses.items()):
+                    lines.append(
+                        f'launcher_requests_total{{{labels},status="{status}"}}'
+                        f" {count}"
+                    )
+
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, metrics.buckets):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else str(bound)
+                    histogram.append(
+                        "launcher_request_duration_seconds_bucket"
+                        f'{{{labels},le="{le}"}} {cumulative}'
+                    )
+                histogram += [
+                    f"launcher_request_duration_seconds_sum{{{labels}}}"
+                    f" {metrics.seconds}",
+                    f"launcher_request_duration_seconds_count{{{labels}}}"
+                    f" {metrics.count}",
+                ]
+                sizes.append(
+                    f"launcher_response_bytes_total{{{labels}}}"
+                    f" {metrics.response_bytes}"
+                )
+
+        return "\n".join(lines + histogram + sizes) + "\n"
+
+    def export(self, destination: str, format: str = "json") -> None:
+        """Write the metrics in ``format`` (``json`` or ``prometheus``) into
+        the file ``destination``, ``-`` writes them to stderr.
+        """
+        rendered = (
+            self.as_prometheus() if format == "prometheus" else self.as_json()
+        )
+        if destination == "-":
+            sys.stderr.write(rendered)
+            return
+        with open(destination, "w") as metrics_file:
+            metrics_file.write(rendered)
+
+
+#: metrics of all requests of this process
+METRICS = RequestMetrics()
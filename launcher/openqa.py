@@ -1,8 +1,13 @@
+from __future__ import annotations
+
+from datetime import datetime
 from enum import StrEnum, auto, unique
-from typing import Literal
-from openqa_client.client import OpenQA_Client
+from typing import TYPE_CHECKING, Any, Iterable, Literal
 from pydantic import BaseModel, ConfigDict
 
+if TYPE_CHECKING:
+    from openqa_client.client import OpenQA_Client
+
 
 def _to_job_dep_key(key: str) -> str:
     if key == "directly_chained":
@@ -125,6 +130,237 @@ def fetch_job(client: OpenQA_Client, job_id: int) -> Job:
     return Job(**client.openqa_request("GET", f"jobs/{job_id}")["job"])
 
 
+class JobSummary:
+    """Slim projection of a :py:class:`Job` with only the fields that are
+    needed to monitor a build and to record its history.
+
+    :py:meth:`from_api` validates the scalar fields of the job, the settings
+    are kept as received and only validated once they are accessed.
+    :py:meth:`trusted` skips the validation for data that has been validated
+    before, e.g. the snapshots in the journal of a state file.
+    """
+
+    __slots__ = (
+        "id",
+        "state",
+        "result",
+        "clone_id",
+        "chained",
+        "t_started",
+        "t_finished",
+        "_settings",
+        "_settings_valid",
+    )
+
+    id: int
+    state: JobState
+    result: JobResult
+    #: id of the job as which this failed job has been cloned
+    clone_id: int | None
+    #: ids of the jobs launched after this one
+    chained: tuple[int, ...]
+    t_started: str | None
+    t_finished: str | None
+    _settings: Any
+    _settings_valid: bool
+
+    def __init__(
+        self,
+        id: int,
+        state: JobState,
+        result: JobResult,
+        settings: Any,
+        clone_id: int | None = None,
+        chained: tuple[int, ...] = (),
+        t_started: str | None = None,
+        t_finished: str | None = None,
+        settings_valid: bool = False,
+    ) -> None:
+        self.id = id
+        self.state = state
+        self.result = result
+        self.clone_id = clone_id
+        self.chained = chained
+        self.t_started = t_started
+        self.t_finished = t_finished
+        self._settings = settings
+        self._settings_valid = settings_valid
+
+    @staticmethod
+    def _chained_of(job: dict[str, Any]) -> list[Any]:
+        # the API uses the aliases, Job.model_dump() the field names
+        children = job.get("children") or {}
+        return children.get("Chained", children.get("chained", []))
+
+    @classmethod
+    def from_api(cls, job: dict[str, Any]) -> JobSummary:
+        """Create the summary of a job as returned by the openQA API,
+        validating all fields except for the settings.
+        """
+        chained = cls._chained_of(job)
+        optional_int, optional_str = (int, type(None)), (str, type(None))
+        checks: list[tuple[str, Any, type | tuple[type, ...]]] = [
+            ("id", job["id"], int),
+            ("clone_id", job.get("clone_id"), optional_int),
+            ("t_started", job.get("t_started"), optional_str),
+            ("t_finished", job.get("t_finished"), optional_str),
+            ("children", chained, list),
+            *(("children", child, int) for child in chained),
+        ]
+        for name, value, expected in checks:
+            if not isinstance(value, expected) or isinstance(value, bool):
+                raise ValueError(f"Invalid {name} of job {job['id']}: {value}")
+
+        return cls(
+            id=job["id"],
+            state=JobState(job["state"]),
+            result=JobResult(job["result"]),
+            settings=job.get("settings"),
+            clone_id=job.get("clone_id"),
+            chained=tuple(chained),
+            t_started=job.get("t_started"),
+            t_finished=job.get("t_finished"),
+        )
+
+    @classmethod
+    def trusted(cls, job: dict[str, Any]) -> JobSummary:
+        """Create the summary of a job from data that has been validated
+        before, without validating it again.
+        """
+        return cls(
+            id=job["id"],
+            state=JobState(job["state"]),
+            result=JobResult(job["result"]),
+            settings=job["settings"],
+            clone_id=job.get("clone_id"),
+            chained=tuple(cls._chained_of(job)),
+            t_started=job.get("t_started"),
+            t_finished=job.get("t_finished"),
+            settings_valid=True,
+        )
+
+    @property
+    def settings(self) -> dict[str, str]:
+        """The settings of the job, validated on the first access."""
+        if not self._settings_valid:
+            if not isinstance(self._settings, dict) or not all(
+                isinstance(key, str) and isinstance(value, str)
+                for key, value in self._settings.items()
+            ):
+                raise ValueError(
+                    f"Invalid settings of job {self.id}: {self._settings}"
+                )
+            self._settings_valid = True
+        return self._settings
+
+    def replace(self, **changes: Any) -> JobSummary:
+        """Returns a copy of this summary with the fields in ``changes``
+        replaced.
+        """
+        fields: dict[str, Any] = {
+            "id": self.id,
+            "state": self.state,
+            "result": self.result,
+            "clone_id": self.clone_id,
+            "chained": self.chained,
+            "t_started": self.t_started,
+            "t_finished": self.t_finished,
+            "settings": self._settings,
+            "settings_valid": self._settings_valid,
+        }
+        return JobSummary(**{**fields, **changes})
+
+    def snapshot(self, settings: Iterable[str]) -> dict[str, Any]:
+        """Returns the JSON serializable form of this summary that
+        :py:meth:`trusted` accepts, containing only the ``settings``.
+        """
+        return {
+            "id": self.id,
+            "state": str(self.state),
+            "result": str(self.result),
+            "clone_id": self.clone_id,
+            "children": {"chained": list(self.chained)},
+            "t_started": self.t_started,
+            "t_finished": self.t_finished,
+            "settings": {
+                key: self.settings[key]
+                for key in settings
+                if key in self.settings
+            },
+        }
+
+    def __repr__(self) -> str:
+        return (
+            f"JobSummary(id={self.id}, state={self.state!s}, "
+            f"result={self.result!s}, clone_id={self.clone_id})"
+        )
+
+
+def job_duration(job: Job | JobSummary) -> float | None:
+    """Returns the number of seconds that ``job`` ran or None if it has not
+    finished (or not started).
+    """
+    if not job.t_started or not job.t_finished:
+        return None
+    return (
+        datetime.fromisoformat(job.t_finished)
+        - datetime.fromisoformat(job.t_started)
+    ).total_seconds()
+
+
+#: default number of jobs that are requested at once by :py:func:`fetch_jobs`
+DEFAULT_CHUNK_SIZE = 100
+
+
+def _fetch_job_dicts(
+    client: OpenQA_Client, job_ids: Iterable[int], chunk_size: int
+) -> dict[int, dict[str, Any]]:
+    ids = list(dict.fromkeys(job_ids))
+    jobs: dict[int, dict[str, Any]] = {}
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start : start + chunk_size]
+        reply = client.openqa_request(
+            "GET", "jobs", params={"ids": ",".join(str(i) for i in chunk)}
+        )
+        for job_dict in reply["jobs"]:
+            jobs[job_dict["id"]] = job_dict
+
+        if missing := [job_id for job_id in chunk if job_id not in jobs]:
+            raise ValueError(
+                f"openQA did not return the jobs {', '.join(map(str, missing))}"
+            )
+    return jobs
+
+
+def fetch_jobs(
+    client: OpenQA_Client,
+    job_ids: Iterable[int],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> list[Job]:
+    """Fetch the jobs with the supplied ids via openQA's ``jobs?ids=``
+    query, requesting at most ``chunk_size`` jobs at once.
+
+    The jobs are returned in the order of ``job_ids``.
+    """
+    job_ids = list(job_ids)
+    jobs = _fetch_job_dicts(client, job_ids, chunk_size)
+    return [Job(**jobs[job_id]) for job_id in job_ids]
+
+
+def fetch_job_summaries(
+    client: OpenQA_Client,
+    job_ids: Iterable[int],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> list[JobSummary]:
+    """Like :py:func:`fetch_jobs`, but returns the slim
+    :py:class:`JobSummary` of every job.
+    """
+    job_ids = list(job_ids)
+    jobs = _fetch_job_dicts(client, job_ids, chunk_size)
+    summaries = {job_id: JobSummary.from_api(jobs[job_id]) for job_id in jobs}
+    return [summaries[job_id] for job_id in job_ids]
+
+
 def restart_job(client: OpenQA_Client, job: int | Job) -> None:
     job_id = job if isinstance(job, int) else job.id
     client.openqa_request("POST", f"jobs/{job_id}/restart")
@@ -132,16 +368,24 @@ def restart_job(client: OpenQA_Client, job: int | Job) -> None:
 
 def main() -> None:
     import argparse
-    from launcher.client import NoWaitClient
-    from launcher.argparser import SERVER_PARSER
+    from launcher.argparser import (
+        SERVER_PARSER,
+        configure_clients,
+        configure_metrics,
+    )
 
     parser = argparse.ArgumentParser(parents=[SERVER_PARSER])
     parser.add_argument("job_id", type=int, nargs=1)
 
     args = parser.parse_args()
+    configure_clients(args)
+    configure_metrics(args)
+
+    from launcher.client import get_client
+
     print(
         fetch_job(
-            client=NoWaitClient(server=args.server[0], scheme=args.scheme[0]),
+            client=get_client(args.server[0], args.server_scheme[0]),
             job_id=args.job_id[0],
         )
     )
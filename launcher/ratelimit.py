@@ -0,0 +1,93 @@
+"""Client side rate and connection limits of the requests to openQA."""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from threading import Lock
+
+from launcher.metrics import normalize_path
+
+
+#: default number of connections that are kept alive per host
+DEFAULT_POOL_SIZE = 10
+
+#: requests per second that are sent at most to openQA instances that are
+#: shared with other users, unless configured otherwise
+DEFAULT_RATE_LIMITS: dict[str, float] = {"openqa.opensuse.org": 10.0}
+
+
+@dataclass
+class TokenBucket:
+    """Token bucket that allows ``rate`` acquisitions per second on average
+    and bursts of up to ``burst`` acquisitions.
+
+    Waiting callers reserve their token before they sleep, so that the
+    bucket is shared fairly between threads.
+    """
+
+    #: tokens that are added per second
+    rate: float
+    #: maximum number of tokens in the bucket
+    burst: float = 1.0
+
+    _tokens: float = field(default=-1.0, repr=False)
+    _updated: float = field(default_factory=time.monotonic, repr=False)
+    _lock: Lock = field(default_factory=Lock, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.rate <= 0:
+            raise ValueError(f"rate must be positive, got {self.rate}")
+        self.burst = max(self.burst, 1.0)
+        self._tokens = self.burst
+
+    def reserve(self) -> float:
+        """Take a token and return the number of seconds that the caller
+        has to wait until it may use it.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self) -> float:
+        """Block until a token is available and return the time waited."""
+        if (delay := self.reserve()) > 0:
+            time.sleep(delay)
+        return delay
+
+
+@dataclass
+class RateLimiter:
+    """Limits the requests to a server as a whole and optionally the ones to
+    single endpoints, identified by their normalized path (e.g. ``isos`` or
+    ``jobs/{id}/cancel``).
+    """
+
+    #: bucket of all requests to the server, None for no limit
+    server: TokenBucket | None = None
+    #: buckets of the requests to single endpoints
+    endpoints: dict[str, TokenBucket] = field(default_factory=dict)
+
+    def acquire(self, path: str) -> float:
+        """Block until a request to ``path`` may be sent and return the time
+        waited.
+        """
+        waited = 0.0
+        if (bucket := self.endpoints.get(normalize_path(path))) is not None:
+            waited += bucket.acquire()
+        if self.server is not None:
+            waited += self.server.acquire()
+        return waited
+
+
+def parse_endpoint_rate(value: str) -> tuple[str, float]:
+    """Parse a ``PATH=RATE`` command line argument."""
+    path, sep, rate = value.rpartition("=")
+    if not sep or not path:
+        raise ValueError(f"expected PATH=RATE, got {value}")
+    return normalize_path(path), float(rate)
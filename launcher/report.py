@@ -0,0 +1,229 @@
+"""Streaming reports of the jobs of one or more builds.
+
+:py:func:`render` turns the jobs of every :py:class:`ReportSection` into an
+iterator of text chunks, emitting each row as soon as its job is available,
+so that a report never has to be held in memory as a whole and its consumers
+can process it incrementally.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Iterable, Iterator
+from xml.sax.saxutils import escape, quoteattr
+
+from launcher.openqa import JobResult, JobSummary, job_duration
+
+
+#: the supported output formats of :py:func:`render`
+REPORT_FORMATS = ("markdown", "jsonl", "csv", "junit")
+
+#: columns of the JSON Lines and CSV reports
+REPORT_COLUMNS = (
+    "build",
+    "id",
+    "url",
+    "state",
+    "result",
+    "distri",
+    "version",
+    "flavor",
+    "arch",
+    "asset",
+    "clone_id",
+    "t_started",
+    "t_finished",
+)
+
+
+def _asset(job: JobSummary) -> str | None:
+    return job.settings.get("HDD_1") or job.settings.get("ISO_1")
+
+
+def job_row(job: JobSummary, build: str, baseurl: str) -> dict[str, Any]:
+    """Returns the values of the :py:const:`REPORT_COLUMNS` of ``job``."""
+    return {
+        "build": build,
+        "id": job.id,
+        "url": f"{baseurl}/tests/{job.id}",
+        "state": str(job.state),
+        "result": str(job.result),
+        "distri": job.settings.get("DISTRI"),
+        "version": job.settings.get("VERSION"),
+        "flavor": job.settings.get("FLAVOR"),
+        "arch": job.settings.get("ARCH"),
+        "asset": _asset(job),
+        "clone_id": job.clone_id,
+        "t_started": job.t_started,
+        "t_finished": job.t_finished,
+    }
+
+
+@dataclass
+class ReportSection:
+    """The jobs of a single build in a report."""
+
+    build: str
+    #: URL of the openQA instance of the build
+    baseurl: str
+    jobs: Iterable[JobSummary]
+
+
+class Renderer(ABC):
+    """Renders a report: a header, then a section with one row per job for
+    every build and finally a footer.
+    """
+
+    def __init__(self, titled: bool = False) -> None:
+        #: whether the sections are preceded by the name of their build
+        self.titled = titled
+        self.build = ""
+        self.baseurl = ""
+
+    def header(self) -> str:
+        return ""
+
+    def begin_build(self, build: str, baseurl: str) -> str:
+        self.build = build
+        self.baseurl = baseurl
+        return ""
+
+    @abstractmethod
+    def row(self, job: JobSummary) -> str:
+        """Returns the row of ``job``."""
+
+    def end_build(self) -> str:
+        return ""
+
+    def footer(self) -> str:
+        return ""
+
+
+class MarkdownRenderer(Renderer):
+    def begin_build(self, build: str, baseurl: str) -> str:
+        return (
+            super().begin_build(build, baseurl)
+            + (f"## {build}\n\n" if self.titled else "")
+            + """Test | state | result | settings
+-----|-------|--------|---------
+"""
+        )
+
+    def row(self, job: JobSummary) -> str:
+        return (
+            f"[{job.id}]({self.baseurl}/tests/{job.id}) | {job.state.pretty} | {job.result.pretty} | "
+            + f"""{job.settings['DISTRI']} {job.settings['VERSION']}: {(job.settings.get('HDD_1') or job.settings['ISO_1'])}
+"""
+        )
+
+    def end_build(self) -> str:
+        return "\n" if self.titled else ""
+
+
+class JsonLinesRenderer(Renderer):
+    def row(self, job: JobSummary) -> str:
+        return json.dumps(job_row(job, self.build, self.baseurl)) + "\n"
+
+
+class CsvRenderer(Renderer):
+    def _line(self, values: Iterable[Any]) -> str:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(values)
+        return buffer.getvalue()
+
+    def header(self) -> str:
+        return self._line(REPORT_COLUMNS)
+
+    def row(self, job: JobSummary) -> str:
+        values = job_row(job, self.build, self.baseurl)
+        return self._line(values[column] for column in REPORT_COLUMNS)
+
+
+class JUnitRenderer(Renderer):
+    """Renders every build as a test suite and every job as a test case:
+    failed jobs as failures and jobs that did not finish yet as skipped.
+
+    The ``tests`` and ``failures`` attributes of the test suites are omitted,
+    as they are only known once the last row has been written.
+    """
+
+    def header(self) -> str:
+        return '<?xml version="1.0" encoding="UTF-8"?>\n<testsuites>\n'
+
+    def begin_build(self, build: str, baseurl: str) -> str:
+        return (
+            super().begin_build(build, baseurl)
+            + f"  <testsuite name={quoteattr(f'kiwi {build}'.strip())}>\n"
+        )
+
+    def row(self, job: JobSummary) -> str:
+        classname = (
+            f"{job.settings.get('DISTRI')}-{job.settings.get('VERSION')}"
+        )
+        name = f"{job.settings.get('TEST', 'job')} {_asset(job)} ({job.id})"
+        duration = job_duration(job)
+        attributes = (
+            f"classname={quoteattr(classname)} name={quoteattr(name)}"
+            + (f' time="{duration}"' if duration is not None else "")
+        )
+        url = f"{self.baseurl}/tests/{job.id}"
+
+        if job.result.is_failed:
+            body = (
+                f"      <failure message={quoteattr(str(job.result))}>"
+                f"{escape(url)}</failure>\n"
+            )
+        elif job.result in (JobResult.NONE, JobResult.SCHEDULED):
+            body = f"      <skipped message={quoteattr(str(job.state))}/>\n"
+        else:
+            body = ""
+        return (
+            f"    <testcase {attributes}>\n{body}"
+            f"      <system-out>{escape(url)}</system-out>\n"
+            "    </testcase>\n"
+        )
+
+    def end_build(self) -> str:
+        return "  </testsuite>\n"
+
+    def footer(self) -> str:
+        return "</testsuites>\n"
+
+
+def get_renderer(format: str, titled: bool = False) -> Renderer:
+    """Returns the renderer for ``format``, one of
+    :py:const:`REPORT_FORMATS`.
+    """
+    if format == "markdown":
+        return MarkdownRenderer(titled)
+    if format == "jsonl":
+        return JsonLinesRenderer(titled)
+    if format == "csv":
+        return CsvRenderer(titled)
+    if format == "junit":
+        return JUnitRenderer(titled)
+    raise ValueError(f"Unknown report format {format}")
+
+
+def render(
+    sections: Iterable[ReportSection],
+    renderer: Renderer,
+    failed_only: bool = False,
+) -> Iterator[str]:
+    """Render the report of the builds in ``sections``, yielding the header,
+    one chunk per job and the footer. Only the failed jobs are included if
+    ``failed_only`` is set.
+    """
+    yield renderer.header()
+    for section in sections:
+        yield renderer.begin_build(section.build, section.baseurl)
+        for job in section.jobs:
+            if failed_only and not job.result.is_failed:
+                continue
+            yield renderer.row(job)
+        yield renderer.end_build()
+    yield renderer.footer()
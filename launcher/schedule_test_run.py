@@ -2,13 +2,16 @@ def main() -> None:
     from argparse import ArgumentParser
     from datetime import datetime
     from itertools import chain
-    from json import dumps
     from typing import List
 
-    from osc import conf
-
-    from launcher.argparser import SERVER_PARSER
-    from launcher.client import NoWaitClient
+    from launcher.argparser import (
+        HISTORY_PARSER,
+        SERVER_PARSER,
+        configure_clients,
+        configure_metrics,
+        open_history,
+    )
+    from launcher.asset_check import ASSET_CHECK_MODES
     from launcher.constants import (
         ALL_TESTS,
         CENTOS_8_TESTS,
@@ -30,14 +33,23 @@ def main() -> None:
         UBUNTU_TESTS,
         KIWI_DISTRO_MATRIX,
     )
-    from launcher.image_tests import DistroTest
-    from launcher.running_build import RunningBuild
-
-    # initialize the config datastructures or else the fetch of the published
-    # binaries fails
-    conf.get_config()
+    from launcher.image_tests import (
+        API_URL,
+        DEFAULT_OBS_CACHE_TTL,
+        DistroTest,
+        JobSubmissionError,
+        JobSubmissionFailure,
+        OBS_BINARY_LIST_CACHE,
+        cell_images,
+        cell_of,
+        default_obs_cache_dir,
+        resolve_download_urls,
+        resolve_published_images,
+    )
 
-    parser = ArgumentParser("kiwi-openqa-launcher", parents=[SERVER_PARSER])
+    parser = ArgumentParser(
+        "kiwi-openqa-launcher", parents=[SERVER_PARSER, HISTORY_PARSER]
+    )
     parser.add_argument(
         "--git-remote",
         help="""The git repository from which the tests are loaded.
@@ -107,8 +119,97 @@ Only enable this when the openQA host can reach download.opensuse.org via https
 """,
         action="store_true",
     )
+    parser.add_argument(
+        "--obs-api-url",
+        help=f"""URL of the OBS API from which the binary listings are fetched.
+It must be configured in your oscrc. Defaults to {API_URL}""",
+        nargs=1,
+        default=[API_URL],
+        type=str,
+    )
+    parser.add_argument(
+        "--obs-workers",
+        help="""Number of parallel requests to OBS used to resolve the download
+urls of the images. Defaults to 8.""",
+        nargs=1,
+        default=[8],
+        type=int,
+    )
+    parser.add_argument(
+        "--obs-cache-ttl",
+        help=f"""Number of seconds for which the binary listings fetched from OBS
+are cached on disk. Defaults to {DEFAULT_OBS_CACHE_TTL}.""",
+        nargs=1,
+        default=[DEFAULT_OBS_CACHE_TTL],
+        type=float,
+    )
+    parser.add_argument(
+        "--no-obs-cache",
+        help="Don't cache the binary listings fetched from OBS on disk",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--offline",
+        help="""Don't contact OBS and resolve the images exclusively from the
+binary listings cached on disk.""",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--only-changed",
+        help="""Only schedule the jobs whose image changed since the last build
+(according to the published sha256 checksum) or whose jobs did not all pass in
+the last build. Requires the history.""",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--check-assets",
+        help="""Check that the ISOs and disk images of all jobs can be
+downloaded before any job is scheduled: 'report' prints the unavailable assets
+and schedules all jobs anyway, 'drop' does not schedule the jobs whose assets
+are unavailable. Defaults to off.""",
+        nargs=1,
+        default=["off"],
+        choices=ASSET_CHECK_MODES,
+        type=str,
+    )
+    parser.add_argument(
+        "--asset-check-workers",
+        help="""Number of assets that are checked in parallel.
+Defaults to 16.""",
+        nargs=1,
+        default=[16],
+        type=int,
+    )
+    parser.add_argument(
+        "--submission-workers",
+        help="""Number of jobs that are submitted to openQA in parallel.
+Defaults to 4.""",
+        nargs=1,
+        default=[4],
+        type=int,
+    )
 
     args = parser.parse_args()
+    configure_metrics(args)
+
+    if args.only_changed and args.no_history:
+        parser.error("--only-changed cannot be used with --no-history")
+
+    if args.offline and args.no_obs_cache:
+        raise UserWarning("cannot use --offline without the OBS cache")
+
+    if not args.no_obs_cache:
+        OBS_BINARY_LIST_CACHE.cache_dir = default_obs_cache_dir()
+    OBS_BINARY_LIST_CACHE.ttl = args.obs_cache_ttl[0]
+    OBS_BINARY_LIST_CACHE.offline = args.offline
+    OBS_BINARY_LIST_CACHE.api_url = args.obs_api_url[0]
+
+    if not args.offline:
+        from osc import conf
+
+        # initialize the config datastructures or else the fetch of the
+        # published binaries fails
+        conf.get_config()
 
     if args.distri and args.version_distri:
         raise UserWarning(
@@ -117,10 +218,14 @@ Only enable this when the openQA host can reach download.opensuse.org via https
 
     build = args.build[0] or datetime.now().strftime("%Y%m%d")
 
-    client = NoWaitClient(
-        server=(server := args.server[0]),
-        scheme=(scheme := args.server_scheme[0]),
-    )
+    server = args.server[0]
+    scheme = args.server_scheme[0]
+    client = None
+    if not args.dry_run:
+        from launcher.client import get_client
+
+        configure_clients(args)
+        client = get_client(server=server, scheme=scheme)
 
     jobs = []
 
@@ -154,15 +259,103 @@ Only enable this when the openQA host can reach download.opensuse.org via https
 
     for tests in all_tests:
         tests.use_https_for_asset_download = args.use_https_for_asset_download
-        jobs += tests.trigger_tests(
-            client,
-            args.git_remote[0],
-            build,
-            dry_run=args.dry_run,
-            openqa_host_os=args.openqa_host_os[0],
+
+    resolve_download_urls(all_tests, max_workers=args.obs_workers[0])
+
+    all_params = [
+        tests.build_params(
+            args.git_remote[0], build, openqa_host_os=args.openqa_host_os[0]
+        )
+        for tests in all_tests
+    ]
+
+    images = {}
+    if args.only_changed or not (args.dry_run or args.no_history):
+        images = resolve_published_images(
+            all_tests,
+            max_workers=args.obs_workers[0],
+            checksums_required=args.only_changed,
         )
 
+    if args.only_changed:
+        history = open_history(args)
+        assert history is not None
+        with history:
+            last_images = history.last_images(args.server[0])
+
+        def is_unchanged(params) -> bool:
+            cell = cell_of(params)
+            _, sha256 = images[cell[:4]]
+            return sha256 is not None and last_images.get(cell) == (
+                sha256,
+                True,
+            )
+
+        changed_params = [
+            [params for params in test_params if not is_unchanged(params)]
+            for test_params in all_params
+        ]
+        skipped = sum(map(len, all_params)) - sum(map(len, changed_params))
+        all_params = changed_params
+        print(
+            f"Skipped {skipped} jobs whose image did not change since they "
+            "passed"
+        )
+
+    if args.check_assets[0] != "off":
+        from launcher.asset_check import (
+            asset_urls,
+            check_assets,
+            split_by_assets,
+        )
+
+        # check the assets of all tests at once, as many of them share the
+        # same download server
+        statuses = check_assets(
+            (
+                url
+                for test_params in all_params
+                for params in test_params
+                for url in asset_urls(params)
+            ),
+            max_workers=args.asset_check_workers[0],
+        )
+        checked_params = []
+        asset_failures = []
+        for test_params in all_params:
+            available, unavailable = split_by_assets(test_params, statuses)
+            checked_params.append(available)
+            asset_failures += unavailable
+        for asset_failure in asset_failures:
+            print(asset_failure)
+        if args.check_assets[0] == "drop":
+            dropped = sum(map(len, all_params)) - sum(map(len, checked_params))
+            all_params = checked_params
+            print(f"Dropped {dropped} jobs with unavailable assets")
+
+    failures: List[JobSubmissionFailure] = []
+    for test_params in all_params:
+        try:
+            jobs += DistroTest.submit_params(
+                client,
+                test_params,
+                dry_run=args.dry_run,
+                max_workers=args.submission_workers[0],
+            )
+        except JobSubmissionError as exc:
+            jobs += exc.launched_jobs
+            failures += exc.failures
+
+    print(
+        f"Fetched {OBS_BINARY_LIST_CACHE.misses} binary listings from OBS, "
+        f"{OBS_BINARY_LIST_CACHE.disk_hits} were loaded from the on-disk "
+        f"cache and {OBS_BINARY_LIST_CACHE.hits} were served from memory"
+    )
+
     if not args.dry_run:
+        from launcher.build_state import write_build_state
+        from launcher.running_build import RunningBuild
+
         running_build = RunningBuild(
             build=build,
             job_ids=list(chain(*[j["ids"] for j in jobs])),
@@ -174,7 +367,28 @@ Only enable this when the openQA host can reach download.opensuse.org via https
             + datetime.now().strftime("%Y_%B_%d-%H_%M_%S")
             + ".json"
         )
-        with open(filename, "w") as build_state_file:
-            build_state_file.write(dumps(running_build.__dict__, indent="\t"))
+        write_build_state(filename, running_build)
 
         print(f"Wrote build state into {filename}")
+
+        if (history := open_history(args)) is not None:
+            with history:
+                history.record_build(server, build, running_build.job_ids)
+                history.record_images(
+                    server,
+                    build,
+                    cell_images(
+                        [
+                            params
+                            for test_params in all_params
+                            for params in test_params
+                        ],
+                        images,
+                    ),
+                )
+
+    if failures:
+        raise RuntimeError(
+            f"Failed to schedule {len(failures)} jobs:\n"
+            + "\n".join(str(failure) for failure in failures)
+        )
@@ -1,73 +1,266 @@
-from openqa_client.client import OpenQA_Client
+from __future__ import annotations
+
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    TypeVar,
+)
 
 from launcher.constants import (
     KIWI_TEST_SUITES,
-    KIWI_PRODUCTS,
     KIWI_JOB_GROUP_NAME,
-    KIWI_JOB_TEMPLATE,
     SIXTY_FOUR_BIT_MACHINE_SETTINGS,
 )
+from launcher.types import Method, Product
 
+if TYPE_CHECKING:
+    from openqa_client.client import OpenQA_Client
 
-def ensure_kiwi_settings(client: OpenQA_Client) -> None:
-    test_suites = client.openqa_request("GET", "test_suites")["TestSuites"]
 
-    for suite_name in KIWI_TEST_SUITES:
-        matching_suites = list(
-            filter(lambda s: s["name"] == suite_name, test_suites)
+def _flatten_settings(params: Any) -> Any:
+    """Convert the ``[{"key": k, "value": v}]`` settings in ``params`` into
+    the ``settings[k]=v`` parameters that openQA expects.
+
+    openqa_request would convert them into a dictionary instead, which
+    requests encodes as ``settings=k``, dropping all values.
+    """
+    if not isinstance(params, dict) or not isinstance(
+        settings := params.get("settings"), list
+    ):
+        return params
+    return {
+        **{key: value for key, value in params.items() if key != "settings"},
+        **{f"settings[{s['key']}]": s["value"] for s in settings},
+    }
+
+
+@dataclass
+class SettingsChange:
+    """A request that creates or updates an entry on openQA."""
+
+    method: Method
+    path: str
+    description: str
+    params: Any = None
+    data: Any = None
+
+    def apply(self, client: OpenQA_Client) -> Any:
+        return client.openqa_request(
+            self.method,
+            self.path,
+            params=_flatten_settings(self.params),
+            data=self.data,
         )
+
+    def __str__(self) -> str:
+        return f"{self.method} {self.path}: {self.description}"
+
+
+@dataclass
+class SettingsChangeFailure:
+    change: SettingsChange
+    error: Exception
+
+    def __str__(self) -> str:
+        return f"Failed to {self.change.description}, got {self.error}"
+
+
+_K = TypeVar("_K", bound=Hashable)
+
+
+def _index(
+    entries: List[Dict[str, Any]], key: Callable[[Dict[str, Any]], _K]
+) -> Dict[_K, List[Dict[str, Any]]]:
+    """Group the entries fetched from openQA by ``key`` in a single pass.
+    Duplicates end up in the same list.
+    """
+    index: Dict[_K, List[Dict[str, Any]]] = {}
+    for entry in entries:
+        index.setdefault(key(entry), []).append(entry)
+    return index
+
+
+def _settings_equal(
+    remote: List[Dict[str, Any]], desired: List[Dict[str, Any]]
+) -> bool:
+    """Compare two lists of settings in the ``[{"key": k, "value": v}]``
+    format used by the openQA API, ignoring their order and value types.
+    """
+    return {s["key"]: str(s["value"]) for s in remote} == {
+        s["key"]: str(s["value"]) for s in desired
+    }
+
+
+def template_digest(template: Any) -> str:
+    """Return the sha256 digest of a job template, which is either the YAML
+    document or its already parsed content.
+
+    The digest is calculated from the canonical JSON representation of the
+    parsed template, so that it does not depend on the formatting, the key
+    order or the comments of the YAML document.
+    """
+    if isinstance(template, str):
+        import yaml  # type: ignore[import-untyped]
+
+        template = yaml.safe_load(template)
+    return hashlib.sha256(
+        json.dumps(
+            template, sort_keys=True, separators=(",", ":"), default=str
+        ).encode()
+    ).hexdigest()
+
+
+def _fetch_job_template(
+    client: OpenQA_Client, job_group: Dict[str, Any]
+) -> Any:
+    """Return the YAML template of ``job_group`` on openQA, either from the
+    entry of the job group itself or by fetching it separately.
+    """
+    if (template := job_group.get("template")) is not None:
+        return template
+    return client.openqa_request(
+        "GET", f"job_templates_scheduling/{job_group['id']}"
+    )
+
+
+def plan_kiwi_settings(client: OpenQA_Client) -> List[SettingsChange]:
+    """Compare the kiwi test suites, products and machines with the ones on
+    openQA and return the changes that are necessary to create the missing
+    ones and to update the outdated ones.
+    """
+    # the products are only built on first access
+    from launcher.constants import KIWI_PRODUCTS
+
+    changes: List[SettingsChange] = []
+
+    test_suites = _index(
+        client.openqa_request("GET", "test_suites")["TestSuites"],
+        lambda s: s["name"],
+    )
+    for suite_name in KIWI_TEST_SUITES:
+        matching_suites = test_suites.get(suite_name, [])
         params = {**KIWI_TEST_SUITES[suite_name], "name": suite_name}
         if len(matching_suites) > 1:
             raise ValueError(
                 f"Found {len(matching_suites)} with the name {suite_name}"
             )
         elif len(matching_suites) == 1:
-            client.openqa_request(
-                "POST",
-                f"test_suites/{matching_suites[0]['id']}",
-                params=params,
-            )
+            suite = matching_suites[0]
+            description = params["description"]
+            if suite.get("description") != description or not _settings_equal(
+                suite.get("settings", []),
+                KIWI_TEST_SUITES[suite_name]["settings"],
+            ):
+                changes.append(
+                    SettingsChange(
+                        "POST",
+                        f"test_suites/{suite['id']}",
+                        f"update the test suite {suite_name}",
+                        params=params,
+                    )
+                )
         else:
-            client.openqa_request("POST", "test_suites", params=params)
+            changes.append(
+                SettingsChange(
+                    "POST",
+                    "test_suites",
+                    f"create the test suite {suite_name}",
+                    params=params,
+                )
+            )
 
-    products = client.openqa_request("GET", "products")["Products"]
+    products = _index(
+        client.openqa_request("GET", "products")["Products"], Product.db_key_of
+    )
     for kiwi_product in KIWI_PRODUCTS:
-        matching_products = list(
-            filter(lambda p: kiwi_product.equal_in_db(p), products)
-        )
+        matching_products = products.get(kiwi_product.db_key, [])
+        # openqa_request replaces the settings of the parameters in place
+        params = {**kiwi_product.__dict__}
         if len(matching_products) > 1:
             raise ValueError(
                 f"Got {len(matching_products)} products matching"
                 f" {kiwi_product=}"
             )
         elif len(matching_products) == 1:
-            client.openqa_request(
-                "PUT",
-                f"products/{matching_products[0]['id']}",
-                params=kiwi_product.__dict__,
-            )
+            if not _settings_equal(
+                matching_products[0].get("settings", []),
+                kiwi_product.settings,
+            ):
+                changes.append(
+                    SettingsChange(
+                        "PUT",
+                        f"products/{matching_products[0]['id']}",
+                        f"update the product {kiwi_product.name}",
+                        params=params,
+                    )
+                )
         else:
-            client.openqa_request(
-                "POST", "products", params=kiwi_product.__dict__
+            changes.append(
+                SettingsChange(
+                    "POST",
+                    "products",
+                    f"create the product {kiwi_product.name}",
+                    params=params,
+                )
             )
 
-    machines = client.openqa_request("GET", "machines")["Machines"]
-    sixty_four_bit_machine = [
-        machine for machine in machines if machine["name"] == "64bit"
-    ]
+    machines = _index(
+        client.openqa_request("GET", "machines")["Machines"],
+        lambda m: m["name"],
+    )
+    sixty_four_bit_machine = machines.get("64bit", [])
     if len(sixty_four_bit_machine) > 1:
         raise ValueError(
             f"Got {len(sixty_four_bit_machine)} machines with the name '64bit'"
         )
     elif len(sixty_four_bit_machine) == 0:
-        client.openqa_request(
-            "POST", "machines", params=SIXTY_FOUR_BIT_MACHINE_SETTINGS
+        changes.append(
+            SettingsChange(
+                "POST",
+                "machines",
+                "create the machine 64bit",
+                params={**SIXTY_FOUR_BIT_MACHINE_SETTINGS},
+            )
         )
 
-    job_groups = client.openqa_request("GET", "job_groups")
-    matching_job_groups = list(
-        filter(lambda g: g["name"] == KIWI_JOB_GROUP_NAME, job_groups)
+    return changes
+
+
+def ensure_kiwi_settings(
+    client: OpenQA_Client, plan_only: bool = False, max_workers: int = 8
+) -> List[SettingsChange]:
+    """Create or update the kiwi test suites, products, machines and the job
+    group on openQA, applying at most ``max_workers`` changes in parallel.
+
+    Only the entries that are missing or differ from the desired state are
+    sent to openQA, the job template is only uploaded if the digest of the
+    template on openQA differs from the one of
+    :py:const:`~launcher.constants.KIWI_JOB_TEMPLATE`.
+    If ``plan_only`` is True, then the changes are printed
+    instead of being applied.
+
+    Returns the list of necessary changes.
+    """
+    # the job template is only built on first access
+    from launcher.constants import KIWI_JOB_TEMPLATE, KIWI_JOB_TEMPLATE_DATA
+
+    changes = plan_kiwi_settings(client)
+
+    job_groups = _index(
+        client.openqa_request("GET", "job_groups"), lambda g: g["name"]
     )
+    matching_job_groups = job_groups.get(KIWI_JOB_GROUP_NAME, [])
+    grp_id: Optional[int] = None
+    template_outdated = False
     if len(matching_job_groups) > 1:
         raise ValueError(
             f"Got {len(matching_job_groups)} job groups with the name "
@@ -75,39 +268,80 @@ def ensure_kiwi_settings(client: OpenQA_Client) -> None:
         )
     elif len(matching_job_groups) == 1:
         grp_id = matching_job_groups[0]["id"]
-        client.openqa_request(
-            "PUT",
-            f"job_groups/{grp_id}",
-            data={
-                "name": KIWI_JOB_GROUP_NAME,
-            },
-        )
-    else:
-        grp_id = client.openqa_request(
+        template_outdated = template_digest(
+            _fetch_job_template(client, matching_job_groups[0])
+        ) != template_digest(KIWI_JOB_TEMPLATE_DATA)
+
+    create_group = SettingsChange(
+        "POST",
+        "job_groups",
+        f"create the job group {KIWI_JOB_GROUP_NAME}",
+        data={"name": KIWI_JOB_GROUP_NAME, "template": KIWI_JOB_TEMPLATE},
+    )
+
+    def upload_template(grp_id: int) -> SettingsChange:
+        return SettingsChange(
             "POST",
-            "job_groups",
+            f"job_templates_scheduling/{grp_id}",
+            f"upload the job template of {KIWI_JOB_GROUP_NAME}",
             data={
                 "name": KIWI_JOB_GROUP_NAME,
                 "template": KIWI_JOB_TEMPLATE,
+                "schema": "JobTemplates-01.yaml",
             },
-        )["id"]
+        )
 
-    client.openqa_request(
-        "POST",
-        f"job_templates_scheduling/{grp_id}",
-        data={
-            "name": KIWI_JOB_GROUP_NAME,
-            "template": KIWI_JOB_TEMPLATE,
-            "schema": "JobTemplates-01.yaml",
-        },
-    )
+    if plan_only:
+        for change in (
+            changes
+            + ([create_group] if grp_id is None else [])
+            + (
+                [upload_template(grp_id)]
+                if grp_id is not None and template_outdated
+                else []
+            )
+        ):
+            print(change)
+        return changes
+
+    def apply(change: SettingsChange) -> SettingsChangeFailure | None:
+        try:
+            change.apply(client)
+        except Exception as exc:
+            return SettingsChangeFailure(change, exc)
+        return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        failures = [
+            failure
+            for failure in executor.map(apply, changes)
+            if failure is not None
+        ]
+    if failures:
+        raise RuntimeError(
+            f"Failed to apply {len(failures)} settings:\n"
+            + "\n".join(str(failure) for failure in failures)
+        )
+
+    # a new job group is created together with its template
+    if grp_id is None:
+        changes.append(create_group)
+        create_group.apply(client)
+    elif template_outdated:
+        changes.append(template_change := upload_template(grp_id))
+        template_change.apply(client)
+
+    return changes
 
 
 def main() -> None:
     from argparse import ArgumentParser
 
-    from launcher.argparser import SERVER_PARSER
-    from launcher.client import NoWaitClient
+    from launcher.argparser import (
+        SERVER_PARSER,
+        configure_clients,
+        configure_metrics,
+    )
 
     parser = ArgumentParser(
         "kiwi-openqa-settings",
@@ -115,8 +349,27 @@ def main() -> None:
 the kiwi tests""",
         parents=[SERVER_PARSER],
     )
+    parser.add_argument(
+        "--plan",
+        help="Only print the changes that would be applied",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--workers",
+        help="Number of changes that are applied in parallel. Defaults to 8.",
+        nargs=1,
+        default=[8],
+        type=int,
+    )
 
     args = parser.parse_args()
-    client = NoWaitClient(server=args.server[0], scheme=args.server_scheme[0])
+    configure_clients(args)
+    configure_metrics(args)
+
+    from launcher.client import get_client
 
-    ensure_kiwi_settings(client)
+    client = get_client(args.server[0], args.server_scheme[0])
+
+    ensure_kiwi_settings(
+        client, plan_only=args.plan, max_workers=args.workers[0]
+    )
@@ -1,5 +1,8 @@
 from dataclasses import dataclass, field
-from typing import Dict, List, TypedDict, Optional, Union
+from typing import Dict, List, Literal, Tuple, TypedDict, Optional, Union
+
+
+Method = Literal["GET", "POST", "PUT", "DELETE"]
 
 
 class TestSuite(TypedDict):
@@ -23,6 +26,31 @@ class Product:
     arch: str = "x86_64"
     settings: List[Dict[str, str]] = field(default_factory=list)
 
+    @property
+    def name(self) -> str:
+        return f"{self.distri}-{self.version}-{self.flavor}-{self.arch}"
+
+    @property
+    def db_key(self) -> Tuple[str, str, str, str]:
+        """The values of the columns of the UNIQUE constraint of
+        products/mediums.
+        """
+        return (self.distri, self.version, self.flavor, self.arch)
+
+    @staticmethod
+    def db_key_of(
+        other_dict: Dict[str, str]
+    ) -> Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]:
+        """The :py:attr:`db_key` of the product/medium in other_dict as
+        received from the openQA API.
+        """
+        return (
+            other_dict.get("distri"),
+            other_dict.get("version"),
+            other_dict.get("flavor"),
+            other_dict.get("arch"),
+        )
+
     def equal_in_db(self, other_dict: Dict[str, str]) -> bool:
         """
         Check whether the dictionary in other_dict is the 'same' entry given
@@ -30,12 +58,7 @@ class Product:
         """
         # products have a UNIQUE (distri, version, arch, flavor) constraint
         # applied in the DB
-        return (
-            other_dict.get("distri") == self.distri
-            and other_dict.get("version") == self.version
-            and other_dict.get("flavor") == self.flavor
-            and other_dict.get("arch") == self.arch
-        )
+        return Product.db_key_of(other_dict) == self.db_key
 
 
 class JobScheduledWithoutErrorReply(TypedDict):
@@ -51,3 +74,10 @@ class JobScheduledWithErrorReply(JobScheduledWithoutErrorReply):
 JobScheduledReply = Union[
     JobScheduledWithoutErrorReply, JobScheduledWithErrorReply
 ]
+
+
+#: a cell of the test matrix: distri, version, package, arch and flavor
+Cell = Tuple[str, str, str, str, str]
+
+#: name and sha256 checksum (if published) of the image tested in each cell
+CellImages = Dict[Cell, Tuple[str, Optional[str]]]